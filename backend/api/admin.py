@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from backend.core.db import get_db
+from backend.scripts.regroup import regroup
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.post("/regroup")
+def regroup_catalog(
+    dry_run: bool = Query(False, description="Compute the diff without applying it"),
+    db: Session = Depends(get_db),
+):
+    return regroup(db, dry_run=dry_run)
@@ -3,32 +3,66 @@ from sqlalchemy.orm import Session
 from backend.schemas.folder import Folder, FolderCreate
 from backend.crud import folder as crud
 from backend.core.db import get_db
+from backend.core.aio import async_read
+from backend.scripts.watcher import folder_watcher
+from backend.scripts.scan_jobs import scan_jobs
 from pathlib import Path
 
 router = APIRouter(prefix="/folders", tags=["Folders"])
 
 @router.get("/", response_model=list[Folder])
-def list_folders(db: Session = Depends(get_db)):
+@async_read
+def list_folders(db: Session):
     return crud.get_folders(db)
 
 @router.post("/")
 def add_folder(path: str = Query(...),  db: Session = Depends(get_db)):
-    return crud.create_folder(db, path)
+    folder = crud.create_folder(db, path)
+    if folder.is_watching:
+        folder_watcher.watch(Path(folder.path))
+    return folder
 
 @router.delete("/{folder_id}", response_model=Folder)
 def remove_folder(folder_id: int, db: Session = Depends(get_db)):
     folder = crud.delete_folder(db, folder_id)
     if not folder:
         raise HTTPException(status_code=404, detail="Folder not found")
+    folder_watcher.unwatch(Path(folder.path))
     return folder
 
 
-@router.post("/{folder_id}/scan", response_model=Folder)
-def scan_folder(folder_id: int, db: Session = Depends(get_db)):
-    folder = crud.scan_folder(db, folder_id)
+def _submit_scan(db: Session, folder, workers: int) -> dict:
+    job = scan_jobs.submit(Path(folder.path), workers, folder_id=folder.id)
+    if job["status"] == "pending":
+        crud.mark_folder(db, folder.id, "queued")
+    return job
+
+
+@router.post("/scan", status_code=202)
+def scan_all_folders(
+    workers: int = Query(1, ge=0, description="Extraction processes per scan (0 = one per CPU)"),
+    db: Session = Depends(get_db),
+):
+    """Planifie le scan de tous les dossiers ; ils tournent en parallèle selon leur disque."""
+    return [
+        _submit_scan(db, folder, workers)
+        for folder in crud.get_folders(db)
+        if Path(folder.path).is_dir()
+    ]
+
+
+@router.post("/{folder_id}/scan", status_code=202)
+def scan_folder(
+    folder_id: int,
+    workers: int = Query(1, ge=0, description="Extraction processes (0 = one per CPU)"),
+    db: Session = Depends(get_db),
+):
+    folder = crud.get_folder_by_id(db, folder_id)
     if not folder:
         raise HTTPException(status_code=404, detail="Folder not found")
-    return folder
+    if not Path(folder.path).is_dir():
+        raise HTTPException(status_code=400, detail="Folder path is not an existing directory")
+    return _submit_scan(db, folder, workers)
 
 
 
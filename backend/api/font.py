@@ -1,48 +1,296 @@
 from datetime import datetime, timezone
-from fastapi.responses import FileResponse
-from fastapi import APIRouter, Depends, HTTPException, Query
+import anyio
+from fastapi.responses import FileResponse, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pathlib import Path
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
-from backend.core.db import get_db
+from sqlalchemy import func, tuple_
+from backend.core.db import get_db, get_read_db
+from backend.core.cache import ByteLRU
+from backend.core.aio import async_read, run_read
+from backend.core.http import cached_file_response, async_cached_file_response
 from backend.models.font import Font, Family
+from backend.models.subset import Subset
+from backend.crud.subset import get_subset_by_content_hash, subset_url
+from backend.crud.search import search_family_ids
+from backend.crud.facet import matching_family_ids, facet_counts
+from backend.scripts.subset import options_hash, canonical_text, subset_key, subset_path, text_subset
+from backend.scripts.subset_queue import subset_queue, ensure_subset
+from backend.scripts.similar import similarity_index
 
 router = APIRouter()
 
+FONT_MIME_TYPES = {
+    ".ttf": "font/ttf",
+    ".otf": "font/otf",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".svg": "image/svg+xml",
+}
+
+# Subsets par texte déjà servis, devant le cache disque
+TEXT_SUBSET_CACHE = ByteLRU(max_bytes=32 * 1024 * 1024)
+MAX_TEXT_CODEPOINTS = 1024
+
+def encode_cursor(name: str | None, family_id: int) -> str:
+    return f"{name or ''},{family_id}"
+
+
+def decode_cursor(after: str) -> tuple[str, int]:
+    # Le nom peut contenir des virgules : l'id est toujours après la dernière
+    name, _, family_id = after.rpartition(",")
+    try:
+        return name, int(family_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor, expected <name>,<id>")
+
+
+# Colonnes lues par family_summary()
+SUMMARY_COLUMNS = (
+    Family.id, Family.name, Family.font_count, Family.formats, Family.subset_hash, Family.representative_id,
+)
+
+
+def family_summary(r) -> dict:
+    # Sans manifeste (familles antérieures aux subsets) : aperçu généré à la demande
+    preview = f"/fonts/{r.representative_id}/preview" if r.representative_id else None
+    return {
+        "id": r.id,
+        "name": r.name,
+        "font_count": r.font_count,
+        "extensions": r.formats.split(",") if r.formats else [],
+        "subset_url": subset_url(r.subset_hash) or preview,
+    }
+
+
 @router.get("/fonts/representative")
-def list_representative_fonts(db: Session = Depends(get_db)):
-    results = (
-        db.query(
-            Family.id,
-            Family.name,
-            func.count(Font.id).label("font_count"),
-            func.group_concat(distinct(Font.format)).label("extensions"),
-        )
-        .join(Font, Family.id == Font.family_id)
-        .group_by(Family.id, Family.name)
-        .order_by(Family.name)
-        .all()
+@async_read
+def list_representative_fonts(
+    db: Session,
+    response: Response,
+    after: str | None = Query(None, description="Keyset cursor <name>,<id> from X-Next-Cursor"),
+    limit: int | None = Query(None, ge=1, le=1000),
+):
+    # Un nom NULL vaut '' (comme dans le curseur) : sinon la comparaison l'exclut de toutes les pages
+    sort_name = func.coalesce(Family.name, "")
+    query = (
+        db.query(*SUMMARY_COLUMNS)
+        .filter(Family.font_count > 0)
+        .order_by(sort_name, Family.id)
     )
+    if after is not None:
+        name, family_id = decode_cursor(after)
+        # sort_name >= name en plus : SQLite ne sait pas chercher dans l'index d'expression
+        # à partir de la seule comparaison de tuples
+        query = query.filter(sort_name >= name, tuple_(sort_name, Family.id) > tuple_(name, family_id))
+    if limit is not None:
+        query = query.limit(limit)
+    results = query.all()
+
+    if limit is not None and len(results) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(results[-1].name, results[-1].id)
+
+    return [family_summary(r) for r in results]
 
+
+@router.get("/fonts/search")
+@async_read
+def search_families(
+    db: Session,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """Recherche plein texte (FTS5) sur les familles, classée par pertinence."""
+    ids = search_family_ids(db, q, limit, offset)
+    if not ids:
+        return []
+    rows = {
+        r.id: r
+        for r in db.query(*SUMMARY_COLUMNS)
+        .filter(Family.id.in_(ids), Family.font_count > 0)
+    }
+    return [family_summary(rows[fid]) for fid in ids if fid in rows]
+
+
+@router.get("/fonts/query")
+@async_read
+def query_families(
+    db: Session,
+    weight_min: int | None = Query(None, ge=1, le=1000),
+    weight_max: int | None = Query(None, ge=1, le=1000),
+    width: list[int] | None = Query(None),
+    italic: bool | None = None,
+    xh_min: float | None = Query(None, ge=0, description="Minimum x_height / units_per_em"),
+    xh_max: float | None = Query(None, ge=0),
+    serif: list[int] | None = Query(None, description="Panose serif style (bSerifStyle)"),
+    vendor: list[str] | None = Query(None),
+    format: list[str] | None = Query(None),
+    limit: int = Query(200, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    """Filtre les familles sur leurs métriques et renvoie les comptes de chaque facette.
+
+    Une famille correspond dès qu'une de ses fonts satisfait tous les filtres. Les comptes
+    d'une facette ignorent son propre filtre, pour pouvoir élargir la sélection.
+    """
+    filters = {
+        "weight_min": weight_min, "weight_max": weight_max, "width": width, "italic": italic,
+        "xh_min": xh_min, "xh_max": xh_max, "serif": serif, "vendor": vendor, "format": format,
+    }
+    query = (
+        db.query(*SUMMARY_COLUMNS)
+        .filter(Family.id.in_(matching_family_ids(db, filters)), Family.font_count > 0)
+    )
+    total = query.count()
+    rows = query.order_by(Family.name, Family.id).offset(offset).limit(limit).all()
+    return {
+        "total": total,
+        "families": [family_summary(r) for r in rows],
+        "facets": facet_counts(db, filters),
+    }
+
+
+@router.get("/fonts/subsets/status")
+async def get_subset_status(family_id: list[int] | None = Query(None)):
+    """État des subsets en file : pending, running, done ou error."""
+    return [
+        {k: job[k] for k in ("family_id", "font_id", "status", "error", "updated_at")}
+        for job in subset_queue.status(family_id)
+    ]
+
+
+@router.get("/fonts/{font_id}/similar")
+@async_read
+def get_similar_fonts(
+    db: Session,
+    font_id: int,
+    k: int = Query(20, ge=1, le=200),
+    same_family: bool = Query(False, description="Include fonts of the same family"),
+    format: list[str] | None = Query(None),
+    italic: bool | None = None,
+    weight_min: int | None = Query(None, ge=1, le=1000),
+    weight_max: int | None = Query(None, ge=1, le=1000),
+):
+    """Plus proches voisins sur les métriques normalisées et le panose."""
+    # Un doublon (woff d'un ttf...) est cherché via sa font canonique
+    canonical_id = db.query(Font.canonical_id).filter(Font.id == font_id).scalar()
+    font_id = canonical_id or font_id
+    neighbours = similarity_index.similar(
+        db, font_id, k, same_family=same_family, formats=format,
+        italic=italic, weight_min=weight_min, weight_max=weight_max,
+    )
+    if neighbours is None:
+        raise HTTPException(status_code=404, detail="Font not found")
+    if not neighbours:
+        return []
+
+    rows = {
+        r.id: r
+        for r in db.query(Font.id, Font.family_id, Font.full_name, Font.style_name, Family.name)
+        .outerjoin(Family, Family.id == Font.family_id)
+        .filter(Font.id.in_([fid for fid, _ in neighbours]))
+    }
     return [
         {
-            "id": r.id,
-            "name": r.name,
-            "font_count": r.font_count,
-            "extensions": sorted(set(filter(None, (r.extensions or "").split(","))))
+            "id": fid,
+            "family_id": rows[fid].family_id,
+            "family_name": rows[fid].name,
+            "full_name": rows[fid].full_name,
+            "style_name": rows[fid].style_name,
+            "distance": round(distance, 4),
+            "subset_url": f"/fonts/{fid}/preview",
         }
-        for r in results
+        for fid, distance in neighbours
+        if fid in rows
     ]
 
+
+@router.get("/fonts/{font_id}/subset")
+def get_text_subset(font_id: int, text: str = Query(..., min_length=1), db: Session = Depends(get_read_db)):
+    text = canonical_text(text)
+    if len(text) > MAX_TEXT_CODEPOINTS:
+        raise HTTPException(status_code=400, detail=f"Text has more than {MAX_TEXT_CODEPOINTS} distinct characters")
+
+    font = db.query(Font.path, Font.sha1).filter(Font.id == font_id).first()
+    if not font:
+        raise HTTPException(status_code=404, detail="Font not found")
+
+    key = subset_key(font.sha1, text)
+    data = TEXT_SUBSET_CACHE.get(key)
+    if data is None:
+        output = text_subset(Path(font.path), font.sha1, text)
+        if output is None:
+            raise HTTPException(status_code=500, detail="Subset generation failed")
+        data = output.read_bytes()
+        TEXT_SUBSET_CACHE.put(key, data)
+
+    return Response(
+        content=data,
+        media_type="font/woff2",
+        headers={"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{key}"'},
+    )
+
+
+@router.get("/fonts/{font_id}/preview")
+def get_font_preview(font_id: int, request: Request, db: Session = Depends(get_db)):
+    font = db.query(Font.id, Font.family_id, Font.path, Font.sha1, Font.canonical_id).filter(Font.id == font_id).first()
+    if not font:
+        raise HTTPException(status_code=404, detail="Font not found")
+    if font.canonical_id is not None:
+        # Même face sous un autre format : un seul subset, celui de la font canonique
+        font = db.query(Font.id, Font.family_id, Font.path, Font.sha1).filter(Font.id == font.canonical_id).first()
+
+    row, job = ensure_subset(db, font.family_id, font.id, Path(font.path), font.sha1)
+    if row is None:
+        if job["status"] in ("pending", "running"):
+            # Encodage en file : le client repasse plus tard
+            return Response(status_code=202, headers={"Retry-After": "1", "Cache-Control": "no-store"})
+        raise HTTPException(status_code=500, detail="Subset generation failed")
+    # URL liée à la font, pas au contenu : revalidation courte via l'ETag
+    return cached_file_response(
+        request, subset_path(row.key), row.content_hash, "font/woff2", cache_control="public, max-age=3600"
+    )
+
+
+@router.get("/api/subsets/{name}")
+async def get_subset_file(name: str, request: Request):
+    """Subset adressé par le hash de son contenu : cacheable indéfiniment."""
+    content_hash = name.removesuffix(".woff2").lower()
+    row = await run_read(get_subset_by_content_hash, content_hash)
+    if not row or not await anyio.Path(subset_path(row.key)).exists():
+        raise HTTPException(status_code=404, detail="Subset not found")
+    return await async_cached_file_response(
+        request,
+        subset_path(row.key),
+        content_hash,
+        "font/woff2",
+        cache_control="public, max-age=31536000, immutable",
+    )
+
+
 @router.get("/fonts/data/{id}")
-def get_font_by_id(id, db: Session = Depends(get_db)):
+@async_read
+def get_font_by_id(db: Session, id):
     rows = (db.query(Font).filter(Font.id == id)).all()
     return rows
 
 
 @router.get("/fonts/family/{id}")
-def get_family(id, db: Session = Depends(get_db)):
-    rows = db.query(Font).filter(Font.family_id == id).all()
+@async_read
+def get_family(db: Session, id):
+    rows = (
+        db.query(Font, Subset.content_hash)
+        .outerjoin(Subset, (Subset.font_id == Font.id) & (Subset.options == options_hash()))
+        .filter(Font.family_id == id, Font.canonical_id.is_(None))
+        .all()
+    )
+    # Formats disponibles par face : la font canonique et ses doublons
+    formats = {f.id: {f.format} for f, _ in rows}
+    for canonical_id, fmt in db.query(Font.canonical_id, Font.format).filter(
+        Font.family_id == id, Font.canonical_id.isnot(None)
+    ):
+        formats.setdefault(canonical_id, set()).add(fmt)
     return [
             {
                 "id": f.id,
@@ -50,11 +298,39 @@ def get_family(id, db: Session = Depends(get_db)):
                 "full_name": f.full_name,
                 "style_name": f.style_name,
                 "path": f.path,
+                "formats": sorted(filter(None, formats.get(f.id, ()))),
+                "status": f.status,
+                # URL immuable si le subset existe déjà, sinon génération à la demande
+                "subset_url": subset_url(content_hash) or f"/fonts/{f.id}/preview",
+                "file_url": f"/fonts/{f.id}/file",
                 "created_at": f.created_at,
             }
-            for f in rows
+            for f, content_hash in rows
         ]
 
+@router.get("/fonts/{ref}/file")
+async def get_font_file(ref: str, request: Request):
+    """Fichier original, adressé par id ou par sha1, avec validateurs de cache."""
+    def lookup(db: Session):
+        query = db.query(Font.path, Font.sha1)
+        if ref.isdigit():
+            return query.filter(Font.id == int(ref)).first()
+        return query.filter(Font.sha1 == ref.lower()).first()
+
+    font = await run_read(lookup)
+    if not font:
+        raise HTTPException(status_code=404, detail="Font not found")
+
+    file = Path(font.path)
+    media_type = FONT_MIME_TYPES.get(file.suffix.lower())
+    if media_type is None:
+        raise HTTPException(status_code=400, detail=f"Invalid font extension: {file.suffix}")
+    try:
+        return await async_cached_file_response(request, file, font.sha1, media_type)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Font file missing: {file}")
+
+
 @router.get("/font")
 def get_local_font(path: str = Query(...)):
     # Remplacer les backslashes échappés en vrais chemins Windows
@@ -70,12 +346,6 @@ def get_local_font(path: str = Query(...)):
         raise HTTPException(status_code=400, detail=f"Invalid font extension: {file.suffix}")
 
     # Déterminer le bon type MIME
-    mime_map = {
-        ".ttf": "font/ttf",
-        ".otf": "font/otf",
-        ".woff": "font/woff",
-        ".woff2": "font/woff2"
-    }
-    media_type = mime_map[file.suffix.lower()]
+    media_type = FONT_MIME_TYPES[file.suffix.lower()]
 
     return FileResponse(file, media_type=media_type)
\ No newline at end of file
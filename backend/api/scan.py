@@ -1,17 +1,91 @@
+import json
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from backend.core.db import get_db
-from backend.scripts.scan import scan
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from backend.scripts.scan_jobs import scan_jobs, FINISHED
 
 router = APIRouter()
 
-@router.get("/scan/path")
-def scan_path(
-    path: str = Query(..., description="Absolute path to folder to scan"),
-    db: Session = Depends(get_db),
-):
+HEARTBEAT_SECONDS = 15
+
+
+def _existing_dir(path: str) -> Path:
     p = Path(path)
     if not p.exists() or not p.is_dir():
         raise HTTPException(status_code=400, detail="Path must be an existing directory")
-    scan(db, p)
+    return p
+
+
+def _get_job(job_id: str) -> dict:
+    job = scan_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    return job
+
+
+@router.get("/scan/path", status_code=202)
+def scan_path(
+    path: str = Query(..., description="Absolute path to folder to scan"),
+    workers: int = Query(1, ge=0, description="Extraction processes (0 = one per CPU)"),
+):
+    """Lance le scan en tâche de fond et renvoie le job (ou celui déjà en cours sur ce chemin)."""
+    return scan_jobs.submit(_existing_dir(path), workers)
+
+
+@router.post("/scan/jobs", status_code=202)
+def create_scan_job(
+    path: str = Query(..., description="Absolute path to folder to scan"),
+    workers: int = Query(1, ge=0, description="Extraction processes (0 = one per CPU)"),
+):
+    return scan_jobs.submit(_existing_dir(path), workers)
+
+
+@router.get("/scan/jobs")
+def list_scan_jobs():
+    return scan_jobs.list()
+
+
+@router.get("/scan/jobs/{job_id}")
+def get_scan_job(job_id: str):
+    return _get_job(job_id)
+
+
+@router.delete("/scan/jobs/{job_id}")
+def cancel_scan_job(job_id: str):
+    job = scan_jobs.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    return job
+
+
+@router.get("/scan/jobs/{job_id}/events")
+async def stream_scan_job(job_id: str):
+    """Progression du job en Server-Sent Events ; le flux se termine avec le job.
+
+    Générateur async : un abonné n'occupe aucun thread du pool pendant l'attente.
+    """
+    job = _get_job(job_id)
+
+    async def events(job):
+        while True:
+            yield f"id: {job['seq']}\nevent: progress\ndata: {json.dumps(jsonable_encoder(job))}\n\n"
+            if job["status"] in FINISHED:
+                yield "event: end\ndata: {}\n\n"
+                return
+            seq = job["seq"]
+            job = await scan_jobs.wait_async(job_id, seq, HEARTBEAT_SECONDS)
+            if job is None:
+                return
+            while job["seq"] == seq:
+                # Rien de neuf : commentaire pour garder la connexion ouverte
+                yield ": keep-alive\n\n"
+                job = await scan_jobs.wait_async(job_id, seq, HEARTBEAT_SECONDS)
+                if job is None:
+                    return
+
+    return StreamingResponse(
+        events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
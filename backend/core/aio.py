@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import inspect
+
+from backend.core.db import ReadSessionLocal
+
+# Autant de threads que de connexions du pool lecture : une requête en attente de
+# la base n'occupe qu'une future, pas un thread du threadpool de Starlette
+READ_WORKERS = 16
+_read_executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="db-read")
+
+
+def _with_read_session(fn, *args, **kwargs):
+    with ReadSessionLocal() as db:
+        return fn(db, *args, **kwargs)
+
+
+async def run_read(fn, *args, **kwargs):
+    """Await fn(db, *args, **kwargs) run on the read executor with a read-only session."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _read_executor, functools.partial(_with_read_session, fn, *args, **kwargs)
+    )
+
+
+def async_read(fn):
+    """Turn a sync route whose first parameter is `db` into an async route on the read executor.
+
+    La signature exposée à FastAPI est celle de la fonction, sans `db`.
+    """
+    sig = inspect.signature(fn)
+    params = list(sig.parameters.values())
+    if not params or params[0].name != "db":
+        raise TypeError(f"{fn.__name__} must take db as its first parameter")
+
+    @functools.wraps(fn)
+    async def route(*args, **kwargs):
+        return await run_read(fn, *args, **kwargs)
+
+    route.__signature__ = sig.replace(parameters=params[1:])
+    del route.__wrapped__
+    return route
+
+
+def shutdown():
+    _read_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,10 +1,74 @@
-from sqlalchemy import create_engine
+import os
+import threading
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.schema import CreateIndex
 
-SQLITE_URL = "sqlite:///./specimen.db"
+DB_PATH = "./specimen.db"
+SQLITE_URL = f"sqlite:///{DB_PATH}"
+# Connexions en lecture seule : le même fichier, ouvert en mode URI ro
+SQLITE_READ_URL = f"sqlite:///file:{DB_PATH}?mode=ro&uri=true"
 
+# Profils de pragmas, choisis par SPECIMEN_DB_PROFILE (balanced par défaut).
+# cache_size négatif = KiB ; mmap_size en octets.
+PROFILES = {
+    "safe": {
+        "journal_mode": "WAL", "synchronous": "FULL", "cache_size": -16000,
+        "mmap_size": 0, "temp_store": "DEFAULT",
+    },
+    "balanced": {
+        "journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024, "temp_store": "MEMORY",
+    },
+    # Gros imports : une coupure de courant peut perdre les dernières transactions
+    "ingest": {
+        "journal_mode": "WAL", "synchronous": "OFF", "cache_size": -256000,
+        "mmap_size": 1024 * 1024 * 1024, "temp_store": "MEMORY",
+    },
+}
+PROFILE = os.environ.get("SPECIMEN_DB_PROFILE", "balanced")
+WRITE_BUSY_TIMEOUT_MS = 30000
+READ_BUSY_TIMEOUT_MS = 5000
+
+
+def apply_pragmas(engine, profile: str, read_only: bool = False):
+    pragmas = dict(PROFILES[profile])
+    if read_only:
+        # Le mode WAL est persistant dans le fichier : seul l'écrivain le pose
+        pragmas.pop("journal_mode")
+        pragmas["query_only"] = "ON"
+        pragmas["busy_timeout"] = READ_BUSY_TIMEOUT_MS
+    else:
+        pragmas["busy_timeout"] = WRITE_BUSY_TIMEOUT_MS
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+# Écrivain : ingestion, scripts et routes qui modifient la base. Les écritures
+# concurrentes restent sérialisées par ingest_lock ; en WAL elles ne bloquent
+# pas les lecteurs.
 engine = create_engine(SQLITE_URL, connect_args={"check_same_thread": False})
+apply_pragmas(engine, PROFILE)
+
+# Un seul écrivain à la fois sur la base : scans, watcher et regroup passent par ce verrou
+ingest_lock = threading.Lock()
+
+# Lecteurs : pool dédié aux routes de l'API en lecture seule
+read_engine = create_engine(
+    SQLITE_READ_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=16,
+    max_overflow=16,
+)
+apply_pragmas(read_engine, PROFILE, read_only=True)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
 def get_db():
@@ -13,3 +77,35 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Session on the read-only pool, for routes that never write."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def migrate(bind=None):
+    """Ajoute aux tables existantes les colonnes et index déclarés depuis leur création.
+
+    create_all() ne crée que les tables manquantes ; sans Alembic, c'est ce qui
+    permet à une base existante de suivre les modèles.
+    """
+    bind = bind or engine
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.tables.values():
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {ddl}'))
+            for index in table.indexes:
+                # IF NOT EXISTS plutôt que checkfirst : la réflexion ignore les index d'expression
+                conn.execute(CreateIndex(index, if_not_exists=True))
@@ -0,0 +1,136 @@
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+import os
+
+import anyio
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+
+class _FullFileResponse(FileResponse):
+    """FileResponse that always sends the whole file.
+
+    Starlette applique lui-même l'en-tête Range (multipart, 400 sur une unité
+    inconnue) ; ici la décision a déjà été prise par _conditional.
+    """
+
+    async def __call__(self, scope, receive, send):
+        headers = [(name, value) for name, value in scope["headers"] if name != b"range"]
+        await super().__call__({**scope, "headers": headers}, receive, send)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Comparaison faible (RFC 9110 §13.1.2) : W/ ignoré
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None | bool:
+    """Single 'bytes=' range -> (start, end) inclusive; None to ignore; False if unsatisfiable."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # plusieurs plages : on sert le fichier complet
+    start_s, _, end_s = spec.strip().partition("-")
+    try:
+        if start_s == "":
+            length = int(end_s)
+            if length <= 0:
+                return False
+            return max(0, size - length), size - 1
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, min(end, size - 1)
+
+
+def _conditional(request: Request, st: os.stat_result, etag: str, cache_control: str):
+    """Validators and range decision shared by the sync and async responses.
+
+    Returns (headers, response, byte_range): `response` is set for 304/416, `byte_range`
+    for a satisfiable single range, both None for the full file.
+    """
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _not_modified(request, etag, st.st_mtime):
+        return headers, Response(status_code=304, headers=headers), None
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, st.st_size)
+        if byte_range is False:
+            headers["Content-Range"] = f"bytes */{st.st_size}"
+            return headers, Response(status_code=416, headers=headers), None
+        if byte_range:
+            headers["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{st.st_size}"
+            return headers, None, byte_range
+    return headers, None, None
+
+
+def cached_file_response(
+    request: Request,
+    path: Path,
+    etag: str,
+    media_type: str,
+    cache_control: str = "public, max-age=604800",
+) -> Response:
+    """FileResponse with a strong ETag, conditional GET (304) and single byte-range support."""
+    st = path.stat()
+    headers, response, byte_range = _conditional(request, st, f'"{etag}"', cache_control)
+    if response is not None:
+        return response
+    if byte_range:
+        start, end = byte_range
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+        return Response(content=data, status_code=206, media_type=media_type, headers=headers)
+    return _FullFileResponse(path, media_type=media_type, headers=headers, stat_result=st)
+
+
+async def async_cached_file_response(
+    request: Request,
+    path: Path,
+    etag: str,
+    media_type: str,
+    cache_control: str = "public, max-age=604800",
+) -> Response:
+    """Async cached_file_response: stat and range reads go through anyio, the body is streamed."""
+    st = await anyio.Path(path).stat()
+    headers, response, byte_range = _conditional(request, st, f'"{etag}"', cache_control)
+    if response is not None:
+        return response
+    if byte_range:
+        start, end = byte_range
+        async with await anyio.open_file(path, "rb") as f:
+            await f.seek(start)
+            data = await f.read(end - start + 1)
+        return Response(content=data, status_code=206, media_type=media_type, headers=headers)
+    # FileResponse lit et envoie le fichier par blocs sans bloquer la boucle
+    return _FullFileResponse(path, media_type=media_type, headers=headers, stat_result=st)
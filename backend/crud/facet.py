@@ -0,0 +1,87 @@
+from sqlalchemy import func, distinct, text
+from sqlalchemy.orm import Session
+from backend.models.facet import FontFacet
+
+
+# Facettes à valeurs discrètes comptées par /fonts/query
+FACETS = {
+    "weight": FontFacet.weight_class - FontFacet.weight_class % 100,  # par centaines
+    "width": FontFacet.width_class,
+    "italic": FontFacet.italic,
+    "serif": FontFacet.serif_class,
+    "vendor": FontFacet.vendor,
+    "format": FontFacet.format,
+}
+
+
+def refresh_facets(db: Session, family_ids):
+    """Rebuild the facet rows of some families from fonts/families in one INSERT ... SELECT. Caller commits."""
+    ids = sorted({fid for fid in family_ids if fid is not None})
+    if not ids:
+        return
+    params = {f"id{n}": fid for n, fid in enumerate(ids)}
+    placeholders = ", ".join(f":{key}" for key in params)
+    # Par font aussi : une font déplacée (regroup) garde sinon sa ligne sous l'ancienne famille
+    db.execute(text(f"""
+        DELETE FROM font_facets
+        WHERE family_id IN ({placeholders})
+           OR font_id IN (SELECT id FROM fonts WHERE family_id IN ({placeholders}))
+    """), params)
+    db.execute(text(f"""
+        INSERT INTO font_facets
+            (font_id, family_id, weight_class, width_class, italic, xh_ratio, serif_class, vendor, format)
+        SELECT fo.id, fo.family_id, fo.weight_class, fo.width_class,
+               coalesce(fo.italic_angle, 0) != 0,
+               CASE WHEN fo.units_per_em > 0 THEN 1.0 * fo.x_height / fo.units_per_em END,
+               json_extract(coalesce(fo.panose, fa.panose), '$[1]'),
+               fa.vendor, fo.format
+        FROM fonts fo
+        JOIN families fa ON fa.id = fo.family_id
+        WHERE fo.family_id IN ({placeholders}) AND fo.status IS NOT 'missing'
+    """), params)
+
+
+def facet_conditions(filters: dict, exclude: str | None = None) -> list:
+    """SQL conditions for the active filters, minus the facet being counted (disjunctive facets)."""
+    conds = []
+    if exclude != "weight":
+        if filters.get("weight_min") is not None:
+            conds.append(FontFacet.weight_class >= filters["weight_min"])
+        if filters.get("weight_max") is not None:
+            conds.append(FontFacet.weight_class <= filters["weight_max"])
+    if exclude != "width" and filters.get("width"):
+        conds.append(FontFacet.width_class.in_(filters["width"]))
+    if exclude != "italic" and filters.get("italic") is not None:
+        conds.append(FontFacet.italic == filters["italic"])
+    if filters.get("xh_min") is not None:
+        conds.append(FontFacet.xh_ratio >= filters["xh_min"])
+    if filters.get("xh_max") is not None:
+        conds.append(FontFacet.xh_ratio <= filters["xh_max"])
+    if exclude != "serif" and filters.get("serif"):
+        conds.append(FontFacet.serif_class.in_(filters["serif"]))
+    if exclude != "vendor" and filters.get("vendor"):
+        conds.append(FontFacet.vendor.in_(filters["vendor"]))
+    if exclude != "format" and filters.get("format"):
+        conds.append(FontFacet.format.in_(filters["format"]))
+    return conds
+
+
+def matching_family_ids(db: Session, filters: dict):
+    return db.query(FontFacet.family_id).filter(*facet_conditions(filters))
+
+
+def facet_counts(db: Session, filters: dict) -> dict:
+    """Number of families per facet value, each facet ignoring its own filter."""
+    counts = {}
+    for name, column in FACETS.items():
+        rows = (
+            db.query(column, func.count(distinct(FontFacet.family_id)))
+            .filter(*facet_conditions(filters, exclude=name))
+            .group_by(column)
+            .all()
+        )
+        counts[name] = [
+            {"value": value, "count": count}
+            for value, count in sorted(rows, key=lambda r: (r[0] is None, r[0]))
+        ]
+    return counts
@@ -0,0 +1,64 @@
+from sqlalchemy import func, distinct
+from sqlalchemy.orm import Session
+from backend.models.font import Font, Family
+from backend.models.subset import Subset
+from backend.crud.search import index_families
+from backend.crud.facet import refresh_facets
+from backend.models.facet import FontFacet
+from backend.scripts.subset import options_hash
+from backend.scripts.similar import similarity_index
+
+
+def refresh_family_stats(db: Session, family_ids=None, chunk: int = 500):
+    """Recompute the denormalised font_count, formats and subset_hash of some (or all) families.
+
+    Deux requêtes groupées par paquet de familles, puis une mise à jour en masse ;
+    l'index de recherche et la table de facettes de ces familles sont resynchronisés
+    au passage. Caller commits.
+    """
+    if family_ids is None:
+        family_ids = [fid for (fid,) in db.query(Family.id)]
+    family_ids = sorted({fid for fid in family_ids if fid is not None})
+
+    for i in range(0, len(family_ids), chunk):
+        ids = family_ids[i:i + chunk]
+        stats = {
+            fid: (count, formats)
+            for fid, count, formats in (
+                # font_count compte les faces ; formats inclut ceux des doublons ;
+                # les fichiers disparus ne comptent pas
+                db.query(
+                    Font.family_id,
+                    func.count(Font.id).filter(Font.canonical_id.is_(None)),
+                    func.group_concat(distinct(Font.format)),
+                )
+                .filter(Font.family_id.in_(ids), Font.status.is_distinct_from("missing"))
+                .group_by(Font.family_id)
+            )
+        }
+        hashes = dict(
+            db.query(Family.id, Subset.content_hash)
+            .join(Subset, (Subset.font_id == Family.representative_id) & (Subset.options == options_hash()))
+            .filter(Family.id.in_(ids))
+        )
+        db.bulk_update_mappings(Family, [
+            {
+                "id": fid,
+                "font_count": stats.get(fid, (0, None))[0],
+                "formats": ",".join(sorted(set(filter(None, (stats.get(fid, (0, None))[1] or "").split(","))))),
+                "subset_hash": hashes.get(fid),
+            }
+            for fid in ids
+        ])
+        index_families(db, ids)
+        refresh_facets(db, ids)
+        similarity_index.invalidate_after_commit(db, ids)
+
+
+def backfill_family_stats(db: Session):
+    """Fill the stats columns once for databases created before they existed."""
+    missing_stats = db.query(Family.id).filter(Family.font_count.is_(None)).first()
+    missing_facets = db.query(Font.id).first() and not db.query(FontFacet.font_id).first()
+    if missing_stats or missing_facets:
+        refresh_family_stats(db)
+        db.commit()
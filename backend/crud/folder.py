@@ -1,9 +1,13 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from backend.models.file_index import FileIndex
 from backend.models.folder import Folder
+from backend.models.font import Font
+from backend.scripts.scan import scan, under
 from backend.schemas.folder import FolderCreate
 from datetime import datetime, timezone
 from pathlib import Path
-import os
+import time
 
 def get_folders(db: Session):
     return db.query(Folder).all()
@@ -26,36 +30,78 @@ def delete_folder(db: Session, folder_id: int):
     return db_folder
 
 
-def scan_folder(db: Session, folder_id: int):
+def mark_folder(db: Session, folder_id: int, status: str):
+    db.query(Folder).filter(Folder.id == folder_id).update(
+        {"status": status, "updated_at": datetime.now(tz=timezone.utc)}, synchronize_session=False
+    )
+    db.commit()
+
+
+def record_folder_scan(db: Session, folder_id: int, counters: dict, duration: float, error: str | None = None):
+    """Store the stats of a finished scan on its folder."""
     folder = get_folder_by_id(db, folder_id)
     if not folder:
         return None
+    folder.file_count = counters.get("discovered", 0)
+    folder.font_count = (
+        db.query(func.count(Font.id))
+        .filter(under(Font.path, Path(folder.path)), Font.status.is_distinct_from("missing"))
+        .scalar()
+    )
+    folder.bytes_total = counters.get("bytes", 0)
+    folder.error_count = counters.get("failed", 0)
+    folder.scan_duration = round(duration, 3)
+    folder.status = "error" if error else "idle"
+    folder.error_message = error
+    folder.last_scan = datetime.now(tz=timezone.utc)
+    folder.updated_at = datetime.now(tz=timezone.utc)
+    db.commit()
+    db.refresh(folder)
+    return folder
 
-    try:
-        folder.status = "scanning"
-        db.add(folder)
-        db.commit()
 
-        p = Path(folder.path)
-        # Count files recursively; ignore errors
-        count = 0
-        for _root, _dirs, files in os.walk(p, topdown=True):
-            count += len(files)
+def folder_totals(db: Session, path: Path) -> dict:
+    """File count and bytes of the indexed files under path, as scan counters."""
+    files, size = (
+        db.query(func.count(FileIndex.path), func.coalesce(func.sum(FileIndex.size), 0))
+        .outerjoin(Font, (Font.path == FileIndex.path) & (Font.status == "missing"))
+        .filter(under(FileIndex.path, path), Font.id.is_(None))
+        .one()
+    )
+    return {"discovered": files, "bytes": size}
+
 
-        folder.file_count = count
-        folder.status = "idle"
-        folder.error_message = None
+def record_folder_totals(db: Session, folder_id: int, duration: float, error: str | None = None):
+    """Record the stats of a folder covered by a scan of one of its parents."""
+    folder = get_folder_by_id(db, folder_id)
+    if not folder:
+        return None
+    return record_folder_scan(db, folder_id, folder_totals(db, Path(folder.path)), duration, error)
+
+
+def scan_folder(db: Session, folder_id: int, workers: int = 1, progress=None, cancel=None, exclude=()):
+    """Run the ingestion pipeline on a registered folder and record its stats."""
+    folder = get_folder_by_id(db, folder_id)
+    if not folder:
+        return None
+
+    mark_folder(db, folder_id, "scanning")
+    started = time.monotonic()
+    counters, error = {}, None
+    try:
+        counters = scan(db, Path(folder.path), workers, progress=progress, cancel=cancel, exclude=exclude)
     except Exception as e:
-        folder.status = "error"
-        folder.error_message = str(e)
+        db.rollback()
+        error = str(e)
+        raise
     finally:
-        folder.last_scan = datetime.now(tz=timezone.utc)
-        folder.updated_at = datetime.now(tz=timezone.utc)
-        db.add(folder)
-        db.commit()
-        db.refresh(folder)
-
-    return folder
+        stats = dict(counters)
+        for path in exclude:
+            # Sous-dossier scanné par un autre job : ses fichiers comptent quand même
+            for key, value in folder_totals(db, path).items():
+                stats[key] = stats.get(key, 0) + value
+        record_folder_scan(db, folder_id, stats, time.monotonic() - started, error)
+    return counters
 
 
 BASE = Path("C:/Users/fredm").resolve()
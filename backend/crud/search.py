@@ -0,0 +1,84 @@
+import re
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+# Index plein texte des familles ; rowid = families.id
+CREATE_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS family_search USING fts5(
+    name, name_normalized, vendor, font_names,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+# Poids bm25 par colonne : le nom de famille compte le plus
+RANK = "bm25(family_search, 10.0, 5.0, 1.0, 2.0)"
+
+
+def ensure_search_index(db: Session) -> bool:
+    """Create the FTS5 table and build it on first run. Returns False if FTS5 is unavailable."""
+    try:
+        db.execute(text(CREATE_FTS))
+    except OperationalError as e:
+        print(f"[search] FTS5 unavailable, search falls back to LIKE: {e}")
+        return False
+    empty = db.execute(text("SELECT NOT EXISTS (SELECT 1 FROM family_search)")).scalar()
+    if empty:
+        ids = [fid for (fid,) in db.execute(text("SELECT id FROM families"))]
+        index_families(db, ids)
+    db.commit()
+    return True
+
+
+def index_families(db: Session, family_ids, chunk: int = 500):
+    """Re-sync the search rows of some families (deleted families simply disappear). Caller commits."""
+    family_ids = sorted({fid for fid in family_ids if fid is not None})
+    for i in range(0, len(family_ids), chunk):
+        ids = family_ids[i:i + chunk]
+        params = {f"id{n}": fid for n, fid in enumerate(ids)}
+        placeholders = ", ".join(f":{key}" for key in params)
+        try:
+            db.execute(text(f"DELETE FROM family_search WHERE rowid IN ({placeholders})"), params)
+        except OperationalError:
+            return  # pas de FTS5 : rien à synchroniser
+        db.execute(text(f"""
+            INSERT INTO family_search (rowid, name, name_normalized, vendor, font_names)
+            SELECT fa.id, fa.name, fa.name_normalized, fa.vendor,
+                   group_concat(coalesce(fo.full_name, '') || ' ' || coalesce(fo.style_name, ''), ' ')
+            FROM families fa
+            JOIN fonts fo ON fo.family_id = fa.id
+            WHERE fa.id IN ({placeholders}) AND fo.canonical_id IS NULL AND fo.status IS NOT 'missing'
+            GROUP BY fa.id
+        """), params)
+
+
+def match_expression(q: str) -> str | None:
+    """'open sa' -> '"open"* "sa"*' : chaque mot en préfixe, tous requis."""
+    tokens = re.findall(r"\w+", q.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_family_ids(db: Session, q: str, limit: int, offset: int) -> list[int]:
+    expression = match_expression(q)
+    if expression is None:
+        return []
+    try:
+        rows = db.execute(
+            text(f"""
+                SELECT rowid FROM family_search
+                WHERE family_search MATCH :q
+                ORDER BY {RANK}, rowid
+                LIMIT :limit OFFSET :offset
+            """),
+            {"q": expression, "limit": limit, "offset": offset},
+        )
+    except OperationalError:
+        like = f"%{q.strip()}%"
+        rows = db.execute(
+            text("SELECT id FROM families WHERE name LIKE :q ORDER BY name, id LIMIT :limit OFFSET :offset"),
+            {"q": like, "limit": limit, "offset": offset},
+        )
+    return [fid for (fid,) in rows]
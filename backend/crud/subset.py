@@ -0,0 +1,49 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from backend.models.font import Family
+from backend.models.subset import Subset
+
+
+def get_subset_by_key(db: Session, key: str):
+    return db.query(Subset).filter(Subset.key == key).first()
+
+
+def get_font_subset(db: Session, font_id: int, key: str):
+    return db.query(Subset).filter(Subset.font_id == font_id, Subset.key == key).first()
+
+
+def get_subset_by_content_hash(db: Session, content_hash: str):
+    return db.query(Subset).filter(Subset.content_hash == content_hash).first()
+
+
+def subset_url(content_hash: str | None) -> str | None:
+    return f"/api/subsets/{content_hash}.woff2" if content_hash else None
+
+
+def record_subset(
+    db: Session,
+    family_id: int | None,
+    font_id: int,
+    key: str,
+    size: int | None,
+    options: str | None = None,
+    content_hash: str | None = None,
+):
+    """Insert the manifest row for (font, key), or refresh its family, size and hash. Caller commits."""
+    stmt = sqlite_insert(Subset).values(
+        family_id=family_id, font_id=font_id, key=key, size=size, options=options, content_hash=content_hash
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Subset.font_id, Subset.key],
+        set_={
+            "family_id": stmt.excluded.family_id,
+            "size": stmt.excluded.size,
+            "content_hash": stmt.excluded.content_hash,
+        },
+    )
+    db.execute(stmt)
+    if content_hash:
+        # Aperçu de famille : le représentant vient d'obtenir son subset
+        db.query(Family).filter(Family.representative_id == font_id).update(
+            {"subset_hash": content_hash}, synchronize_session=False
+        )
@@ -1,16 +1,39 @@
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from backend.core.db import Base, engine
+from backend.core.db import Base, engine, migrate, SessionLocal
+from backend.crud.family import backfill_family_stats
+from backend.crud.search import ensure_search_index
 # Ensure models are imported before create_all so tables exist
 from backend.api import folder as folders_api
 from backend.api import scan as scan_api
 from backend.api import font as font_api
+from backend.api import admin as admin_api
+from backend.scripts.subset_queue import subset_queue
+from backend.scripts.scan_jobs import scan_jobs
+from backend.scripts.watcher import folder_watcher
+from backend.core import aio
 import time
 
 Base.metadata.create_all(bind=engine)
+migrate(engine)
+with SessionLocal() as db:
+    backfill_family_stats(db)
+    ensure_search_index(db)
 
 app = FastAPI(title="Fontbase API")
-app.mount("/api/fonts", StaticFiles(directory="C:\\Users\\fredm\\Code\\Specimen\\backend\\subset"), name="fonts")
 app.include_router(folders_api.router, prefix="/api")
 app.include_router(scan_api.router)
 app.include_router(font_api.router)
+app.include_router(admin_api.router)
+
+
+@app.on_event("startup")
+def start_folder_watcher():
+    folder_watcher.start()
+
+
+@app.on_event("shutdown")
+def stop_subset_queue():
+    folder_watcher.shutdown()
+    scan_jobs.shutdown()
+    subset_queue.shutdown()
+    aio.shutdown()
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Index
+from backend.core.db import Base
+
+
+class FontFacet(Base):
+    """Table de facettes précalculée : une ligne par font, colonnes de famille recopiées.
+
+    Les filtres et comptes de /fonts/query ne touchent que cette table et ses index,
+    sans jointure fonts/families.
+    """
+    __tablename__ = "font_facets"
+    __table_args__ = (
+        Index("ix_font_facets_weight_family", "weight_class", "family_id"),
+        Index("ix_font_facets_width_family", "width_class", "family_id"),
+        Index("ix_font_facets_italic_family", "italic", "family_id"),
+        Index("ix_font_facets_xh_family", "xh_ratio", "family_id"),
+        Index("ix_font_facets_serif_family", "serif_class", "family_id"),
+        Index("ix_font_facets_vendor_family", "vendor", "family_id"),
+        Index("ix_font_facets_format_family", "format", "family_id"),
+    )
+
+    font_id = Column(Integer, ForeignKey("fonts.id"), primary_key=True)
+    family_id = Column(Integer, ForeignKey("families.id"), index=True, nullable=False)
+
+    weight_class = Column(Integer, nullable=True)
+    width_class = Column(Integer, nullable=True)
+    italic = Column(Boolean, nullable=False, default=False)
+    xh_ratio = Column(Float, nullable=True)  # x_height / units_per_em
+    serif_class = Column(Integer, nullable=True)  # panose bSerifStyle
+    vendor = Column(String, nullable=True)
+    format = Column(String, nullable=True)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, BigInteger, Index
+from backend.core.db import Base
+
+
+class FileIndex(Base):
+    """Dernière signature stat() connue d'un fichier scanné, et son sha1."""
+    __tablename__ = "file_index"
+    __table_args__ = (
+        # Fichiers déplacés cherchés par signature lors des scans incrémentaux
+        Index("ix_file_index_signature", "size", "mtime_ns"),
+    )
+
+    path = Column(String(512), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    mtime_ns = Column(BigInteger, nullable=False)
+    inode = Column(BigInteger, nullable=False)
+    sha1 = Column(String(64), nullable=False, index=True)
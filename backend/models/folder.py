@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, BigInteger, Float
 from datetime import datetime, timezone
 from backend.core.db import Base
 
@@ -10,6 +10,10 @@ class Folder(Base):
     is_watching = Column(Boolean, default=True)
     
     file_count = Column(Integer, default=0)
+    font_count = Column(Integer, default=0)
+    bytes_total = Column(BigInteger, default=0)
+    scan_duration = Column(Float, nullable=True)  # secondes
+    error_count = Column(Integer, default=0)
     
     status = Column(String, default="idle")
     error_message = Column(String, nullable=True)
@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Column, Integer, String, Boolean, DateTime,
-    ForeignKey, JSON, Float
+    ForeignKey, JSON, Float, Index, text
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
@@ -13,6 +13,10 @@ class Font(Base):
     id = Column(Integer, primary_key=True, index=True)
     path = Column(String(512), unique=True, nullable=False)
     sha1 = Column(String(64), unique=True, nullable=False)
+    # Empreinte des tables sfnt, indépendante du conteneur (ttf/woff/woff2)
+    fingerprint = Column(String(40), nullable=True, index=True)
+    # Même face déjà au catalogue sous un autre format : ni regroupement, ni subset
+    canonical_id = Column(Integer, ForeignKey("fonts.id"), nullable=True, index=True)
 
     full_name = Column(String)
     style_name = Column(String)
@@ -21,6 +25,11 @@ class Font(Base):
     # Relation avec la famille
     family_id = Column(Integer, ForeignKey("families.id"), index=True)
 
+    # Données de regroupement propres à la font (permet de recalculer les familles)
+    family_name = Column(String, nullable=True)
+    family_normalized = Column(String, nullable=True)
+    panose = Column(JSON, nullable=True)
+
     # Style metrics
     weight_class = Column(Integer)
     width_class = Column(Integer)
@@ -54,6 +63,12 @@ class Font(Base):
 
 class Family(Base):
     __tablename__ = "families"  # nom en minuscules et pluriel par convention
+    __table_args__ = (
+        # Tri (name, id) de /fonts/query
+        Index("ix_families_name_id", "name", "id"),
+        # Pagination par clé (name, id) de /fonts/representative, noms NULL triés comme ''
+        Index("ix_families_sort_name_id", text("coalesce(name, '')"), "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -70,6 +85,11 @@ class Family(Base):
     # Identifiant de la font représentante
     representative_id = Column(Integer, ForeignKey("fonts.id"), nullable=True)
 
+    # Statistiques dénormalisées, tenues à jour par le scan (crud.family.refresh_family_stats)
+    font_count = Column(Integer, nullable=True)
+    formats = Column(String, nullable=True)  # "otf,ttf,woff2"
+    subset_hash = Column(String(40), nullable=True)  # subset du représentant
+
     # Métadonnées et timestamps
     status = Column(String, default="ok")
     last_scan = Column(
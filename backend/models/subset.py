@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from datetime import datetime, timezone
+from backend.core.db import Base
+
+
+class Subset(Base):
+    """Manifeste des subsets : un fichier <key>.woff2 par clé de contenu."""
+    __tablename__ = "subsets"
+    __table_args__ = (UniqueConstraint("font_id", "key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    family_id = Column(Integer, ForeignKey("families.id"), index=True, nullable=True)
+    font_id = Column(Integer, ForeignKey("fonts.id"), index=True, nullable=False)
+
+    # sha1(source sha1 + hash des options), voir scripts.subset.subset_key
+    key = Column(String(64), index=True, nullable=False)
+    options = Column(String(16), index=True, nullable=True)
+    # sha1 du woff2 produit : sert d'URL immuable (/api/subsets/<hash>.woff2)
+    content_hash = Column(String(40), index=True, nullable=True)
+    size = Column(Integer, nullable=True)
+    created = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(tz=timezone.utc)
+    )
@@ -15,6 +15,10 @@ class FolderCreate(FolderBase):
 class Folder(FolderBase):
     id: int
     file_count: int = 0
+    font_count: Optional[int] = 0
+    bytes_total: Optional[int] = 0
+    scan_duration: Optional[float] = None
+    error_count: Optional[int] = 0
     status: str = "idle"
     error_message: Optional[str] = None
     last_scan: datetime
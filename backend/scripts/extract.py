@@ -1,5 +1,8 @@
 from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables._p_o_s_t import postFormat, postFormatSize
+from fontTools.misc import sstruct
 from lxml import etree
+from io import BytesIO
 from pathlib import Path
 from hashlib import sha1
 import re
@@ -19,45 +22,54 @@ DICTIONARY = [
 ]
 STYLE_KEYWORDS = sorted(DICTIONARY, key=lambda w: -len(w))
 
+# Tables hors empreinte : glyf/loca sont réencodées par WOFF2 (transformation), DSIG
+# est retirée à la conversion ; head est prise sans ses champs volatils
+FINGERPRINT_SKIP = {"glyf", "loca", "DSIG"}
+HEAD_CHECKSUM_ADJUSTMENT = slice(8, 12)
+HEAD_FLAGS = slice(16, 18)
+HEAD_MODIFIED = slice(28, 36)
+HEAD_FLAG_WOFF2_TRANSFORMED = 1 << 11
+
 PREFERRED_PLATFORM_IDS = [3, 1, 0]
 PREFERRED_LANG_IDS = [0x0409, 0x0000, 0x040C, 0x0407]
 
 
 def extract(font_path: Path) -> dict | None:
     try:
+        suffix = font_path.suffix.lower()
+        if suffix == ".svg":
+            return extract_svg_font(font_path)
+
+        # Une seule lecture : le même buffer sert au hash et au parsing
+        data = font_path.read_bytes()
         try:
-            font = TTFont(font_path)
+            # lazy=True : seules les tables réellement lues sont décompilées
+            font = TTFont(BytesIO(data), lazy=True)
+        except ModuleNotFoundError:
+            print("The WOFF2 decoder requires the 'brotli' Python package (pip install brotli or brotlicffi)")
+            return None
         except Exception:
-            suffix = font_path.suffix.lower()
-            if suffix == ".woff":
-                font = TTFont(font_path, flavor="woff")
-            elif suffix == ".woff2":
-                try:
-                    font = TTFont(font_path, flavor="woff2")
-                except ModuleNotFoundError:
-                    print("The WOFF2 decoder requires the 'brotli' Python package (pip install brotli or brotlicffi)")
-                    return None
-            elif suffix == ".svg":
-                return extract_svg_font(font_path)
-            else:
-                print(f"[discard] Unsupported font type: {font_path}")
-                return None
+            print(f"[discard] Unsupported font type: {font_path}")
+            return None
 
-        file_sha1 = sha1(font_path.read_bytes()).hexdigest()
-        file_format = font_path.suffix.lower().lstrip('.')
+        file_sha1 = sha1(data).hexdigest()
+        file_format = suffix.lstrip('.')
+        fingerprint = sfnt_fingerprint(font)
 
-        family_name = get_name_record(font, 16) or get_name_record(font, 1)
+        names = index_name_records(font)
+        family_name = get_name_record(font, 16, names) or get_name_record(font, 1, names)
         family_normalized = normalize_name(family_name)
-        full_name = get_name_record(font, 4)
-        style_name = get_name_record(font, 2)  # Nom du style lisible
-        license_info = get_name_record(font, 13) or ''
+        full_name = get_name_record(font, 4, names)
+        style_name = get_name_record(font, 2, names)  # Nom du style lisible
+        license_info = get_name_record(font, 13, names) or ''
 
         # Base metadata
         vendor = None
         panose = None
         code_page1 = None
         code_page2 = None
-        glyph_count = len(font.getGlyphOrder())
+        # maxp suffit : getGlyphOrder() peut décompiler CFF/post pour rien
+        glyph_count = font["maxp"].numGlyphs if "maxp" in font else 0
 
         # Style metrics
         weight_class = None
@@ -112,13 +124,16 @@ def extract(font_path: Path) -> dict | None:
             units_per_em = getattr(font["head"], "unitsPerEm", None)
 
         if "post" in font:
-            italic_angle = getattr(font["post"], "italicAngle", None)
+            # En-tête seulement : le format 2 décoderait tous les noms de glyphes
+            post_header = sstruct.unpack(postFormat, font.getTableData("post")[:postFormatSize])
+            italic_angle = post_header.get("italicAngle")
 
         font.close()
 
         return {
             "path": str(font_path),
             "sha1": file_sha1,
+            "fingerprint": fingerprint,
             "format": file_format,
             "family": family_name,
             "family_normalized": family_normalized,
@@ -169,6 +184,7 @@ def extract_svg_font(font_path: Path) -> dict | None:
         return {
             "path": str(font_path),
             "sha1": sha,
+            "fingerprint": None,
             "format": "svg",
             "family": family_name,
             "family_normalized": family_normalized,
@@ -197,15 +213,53 @@ def extract_svg_font(font_path: Path) -> dict | None:
         return None
 
 
-def get_name_record(font, nameID):
+def sfnt_fingerprint(font) -> str | None:
+    """Hash of the decoded sfnt tables, identical for a face shipped as ttf/otf, woff or woff2.
+
+    Lit les tables brutes du conteneur (décompressées, sans les décompiler), dans
+    l'ordre des tags, hors FINGERPRINT_SKIP et champs volatils de head.
+    """
+    reader = getattr(font, "reader", None)
+    if reader is None:
+        return None
+    digest = sha1()
+    for tag in sorted(str(t) for t in reader.keys()):
+        if tag in FINGERPRINT_SKIP:
+            continue
+        data = reader[tag]
+        if tag == "head" and len(data) >= HEAD_MODIFIED.stop:
+            head = bytearray(data)
+            head[HEAD_CHECKSUM_ADJUSTMENT] = bytes(4)
+            head[HEAD_MODIFIED] = bytes(8)
+            flags = int.from_bytes(head[HEAD_FLAGS], "big") & ~HEAD_FLAG_WOFF2_TRANSFORMED
+            head[HEAD_FLAGS] = flags.to_bytes(2, "big")
+            data = bytes(head)
+        digest.update(tag.encode("latin-1"))
+        digest.update(len(data).to_bytes(4, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def index_name_records(font) -> dict:
+    """Index the name table once: (nameID, platformID, langID) -> records, in table order."""
+    index = {}
+    if "name" not in font:
+        return index
+    for record in font["name"].names:
+        index.setdefault((record.nameID, record.platformID, record.langID), []).append(record)
+    return index
+
+
+def get_name_record(font, nameID, index: dict | None = None):
+    if index is None:
+        index = index_name_records(font)
     for p_id in PREFERRED_PLATFORM_IDS:
         for l_id in PREFERRED_LANG_IDS:
-            for record in font["name"].names:
-                if record.nameID == nameID and record.platformID == p_id and record.langID == l_id:
-                    try:
-                        return record.toUnicode()
-                    except Exception:
-                        continue
+            for record in index.get((nameID, p_id, l_id), ()):
+                try:
+                    return record.toUnicode()
+                except Exception:
+                    continue
     return None
 
 
@@ -1,6 +1,6 @@
+from collections import Counter, defaultdict
 from difflib import SequenceMatcher
-
-from difflib import SequenceMatcher
+import math
 
 MATCHING_THRESHOLD = 0.8
 PANOSE_THRESHOLD = 0.4  # seuil de tolérance panose
@@ -18,6 +18,115 @@ def make_key(metadata: dict):
     """La clé primaire de regroupement est uniquement basée sur le nom de famille normalisé."""
     return metadata.get("family_normalized") or ""
 
+
+def _bigrams(key: str) -> frozenset[tuple[str, int]]:
+    """Bigrammes de key en multiensemble : chaque occurrence est numérotée ("aa", 0), ("aa", 1)..."""
+    seen = defaultdict(int)
+    grams = []
+    for i in range(len(key) - 1):
+        gram = key[i:i + 2]
+        grams.append((gram, seen[gram]))
+        seen[gram] += 1
+    return frozenset(grams)
+
+
+def length_range(length: int, threshold: float) -> range:
+    """Key lengths that can reach threshold: ratio <= 2 * min(la, lb) / (la + lb)."""
+    if threshold <= 0:
+        return range(0, 1 << 30)
+    return range(math.ceil(threshold * length / (2 - threshold) - 1e-9), math.floor(length * (2 - threshold) / threshold + 1e-9) + 1)
+
+
+def min_shared_bigrams(la: int, lb: int, threshold: float) -> int:
+    """Bigrams two keys of these lengths must share to reach threshold (may be <= 0).
+
+    ratio = 2M / (la + lb) et M <= LCS. Les LCS - 1 paires adjacentes de la LCS sont
+    des bigrammes communs, sauf celles coupées par un caractère hors LCS (au plus un
+    par caractère, de chaque côté) : au moins 3 * LCS - la - lb - 1 bigrammes communs.
+    """
+    lcs = math.ceil(threshold * (la + lb) / 2 - 1e-9)
+    return 3 * lcs - la - lb - 1
+
+
+class FamilyIndex(dict):
+    """families_cache avec un index de blocage pour le fuzzy match.
+
+    Chaque clé est indexée par ses bigrammes (multiensemble, sans marqueurs de bord)
+    et par sa longueur. Une clé ne peut atteindre MATCHING_THRESHOLD que si elle
+    partage au moins `min_shared_bigrams()` bigrammes avec la requête : on compte les
+    bigrammes communs sur les seules longueurs compatibles et on garde les clés qui
+    atteignent ce minimum. Les clés trop courtes pour que la borne serve sont prises
+    par longueur. Le blocage ne perd aucun match.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._postings = defaultdict(set)  # (bigramme, longueur) -> clés
+        self._by_length = defaultdict(set)
+        self._order = {}
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self._order[key] = len(self._order)
+            for gram in _bigrams(key):
+                self._postings[gram, len(key)].add(key)
+            self._by_length[len(key)].add(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        del self._order[key]
+        for gram in _bigrams(key):
+            self._postings[gram, len(key)].discard(key)
+        self._by_length[len(key)].discard(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super().pop(key, *default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def candidates(self, key: str) -> list[str]:
+        """Keys that can still reach MATCHING_THRESHOLD, in insertion order."""
+        threshold = MATCHING_THRESHOLD
+        la = len(key)
+        grams = _bigrams(key)
+        lengths = length_range(la, threshold)
+        needed = {
+            lb: min_shared_bigrams(la, lb, threshold)
+            for lb, keys in self._by_length.items()
+            if keys and lb in lengths
+        }
+
+        found = set()
+        for lb, shared in needed.items():
+            if shared <= 0:
+                # Clés courtes : la borne ne sert pas, toutes celles de cette longueur
+                found |= self._by_length[lb]
+                continue
+            counts = Counter()
+            for gram in grams:
+                counts.update(self._postings.get((gram, lb), ()))
+            found.update(other for other, n in counts.items() if n >= shared)
+        return sorted(found, key=self._order.__getitem__)
+
+
+def _candidate_keys(families_cache: dict, key: str):
+    if isinstance(families_cache, FamilyIndex):
+        return families_cache.candidates(key)
+    return list(families_cache.keys())
+
 def group(metadata: dict, families_cache: dict) -> tuple[str, bool]:
     fam_norm_new = make_key(metadata)
     vendor_new = metadata.get("vendor") or ""
@@ -30,8 +139,13 @@ def group(metadata: dict, families_cache: dict) -> tuple[str, bool]:
     # --- Fuzzy match sur family_normalized ---
     best_match_key = None
     best_ratio = 0.0
-    for existing_key, fam_entry in families_cache.items():
-        ratio = fuzzy_ratio(fam_norm_new, existing_key)
+    for existing_key in _candidate_keys(families_cache, fam_norm_new):
+        fam_entry = families_cache[existing_key]
+        matcher = SequenceMatcher(None, fam_norm_new or "", existing_key or "")
+        # Bornes supérieures bon marché avant le vrai ratio
+        if matcher.real_quick_ratio() < MATCHING_THRESHOLD or matcher.quick_ratio() < MATCHING_THRESHOLD:
+            continue
+        ratio = matcher.ratio()
         if ratio >= MATCHING_THRESHOLD and ratio > best_ratio:
             # Vérification permissive sur panose
             panose_existing = tuple(fam_entry.get("panose") or [])
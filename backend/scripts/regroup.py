@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from pathlib import Path
+
+
+def _ensure_project_on_path():
+    this = Path(__file__).resolve()
+    project_root = this.parents[2]  # .../Specimen
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+
+
+_ensure_project_on_path()
+
+from sqlalchemy.orm import Session  # type: ignore
+from backend.models.font import Font, Family  # type: ignore
+from backend.scripts import group as grouping  # type: ignore
+from backend.scripts.extract import normalize_name  # type: ignore
+from backend.scripts.representative import representative_fallback  # type: ignore
+from backend.crud.family import refresh_family_stats  # type: ignore
+from backend.crud.search import index_families  # type: ignore
+from backend.crud.facet import refresh_facets  # type: ignore
+from backend.scripts.scan import ingest_lock  # type: ignore
+
+
+class UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # La plus petite racine gagne : résultat indépendant de l'ordre des unions
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+def load_fonts(db: Session) -> list[dict]:
+    """One query for every font's grouping inputs, falling back to its family's values."""
+    rows = (
+        db.query(
+            Font.id, Font.family_id, Font.family_name, Font.panose,
+            Family.name, Family.panose, Family.vendor,
+        )
+        .outerjoin(Family, Family.id == Font.family_id)
+        .order_by(Font.id)
+        .all()
+    )
+    return [
+        {
+            "id": font_id,
+            "family_id": family_id,
+            "family": font_family or fam_name or "",
+            "name_normalized": normalize_name(font_family or fam_name or ""),
+            "panose": font_panose or fam_panose,
+            "vendor": fam_vendor,
+        }
+        for font_id, family_id, font_family, font_panose, fam_name, fam_panose, fam_vendor in rows
+    ]
+
+
+def cluster(fonts: list[dict]) -> list[list[dict]]:
+    """Cluster fonts by normalized name, merging names linked by a fuzzy match.
+
+    Names are processed in sorted order and only compared through the
+    FamilyIndex blocking, so the output is deterministic and near-linear.
+    """
+    by_name = defaultdict(list)
+    for f in fonts:
+        by_name[f["name_normalized"]].append(f)
+    names = sorted(by_name)
+
+    index = grouping.FamilyIndex()
+    uf = UnionFind(len(names))
+    rank = {}
+    chars = {}
+    for i, name in enumerate(names):
+        panose_new = tuple(by_name[name][0]["panose"] or [])
+        chars[name] = Counter(name)
+        for other in index.candidates(name):
+            # quick_ratio() sans construire de SequenceMatcher : borne supérieure du
+            # ratio par les caractères communs (la longueur est déjà filtrée par l'index)
+            common = sum((chars[name] & chars[other]).values())
+            if 2.0 * common / (len(name) + len(other)) < grouping.MATCHING_THRESHOLD:
+                continue
+            if SequenceMatcher(None, name, other).ratio() < grouping.MATCHING_THRESHOLD:
+                continue
+            panose_other = tuple(index[other]["panose"] or [])
+            if panose_new and panose_other and \
+                    grouping.panose_similarity(panose_new, panose_other) < grouping.PANOSE_THRESHOLD:
+                continue
+            uf.union(i, rank[other])
+        index[name] = {"panose": list(panose_new)}
+        rank[name] = i
+
+    clusters = defaultdict(list)
+    for i, name in enumerate(names):
+        clusters[uf.find(i)].extend(by_name[name])
+    result = [sorted(members, key=lambda f: f["id"]) for members in clusters.values()]
+    return sorted(result, key=lambda members: members[0]["id"])
+
+
+def plan(fonts: list[dict], clusters: list[list[dict]]) -> dict:
+    """Match each cluster to the existing family holding most of its fonts and compute the diff."""
+    claimed = set()
+    assignments = []  # (members, family_id | None)
+    for members in clusters:
+        counts = Counter(f["family_id"] for f in members if f["family_id"] is not None)
+        target = next(
+            (fid for fid, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])) if fid not in claimed),
+            None,
+        )
+        if target is not None:
+            claimed.add(target)
+        assignments.append((members, target))
+
+    existing = {f["family_id"] for f in fonts if f["family_id"] is not None}
+    return {
+        "assignments": assignments,
+        "removed_families": sorted(existing - claimed),
+        "moved": sum(
+            1 for members, target in assignments for f in members if f["family_id"] != target
+        ),
+        "new_families": sum(1 for _, target in assignments if target is None),
+    }
+
+
+def regroup(db: Session, dry_run: bool = False) -> dict:
+    """Recompute every family from scratch and apply only the differences.
+
+    Tout se fait sous ingest_lock et dans une seule transaction : aucun scan ne peut
+    écrire entre la lecture et l'application, et un échec ne laisse pas des familles
+    fusionnées avec des stats, un index de recherche ou des facettes périmés.
+    """
+    with ingest_lock:
+        try:
+            return _regroup(db, dry_run)
+        except Exception:
+            db.rollback()
+            raise
+
+
+def _regroup(db: Session, dry_run: bool) -> dict:
+    fonts = load_fonts(db)
+    diff = plan(fonts, cluster(fonts))
+    stats = {
+        "fonts": len(fonts),
+        "families": len(diff["assignments"]),
+        "moved_fonts": diff["moved"],
+        "new_families": diff["new_families"],
+        "removed_families": len(diff["removed_families"]),
+    }
+    if dry_run:
+        return stats
+
+    # 1. Nouvelles familles (splits), insérées en une fois
+    new_clusters = [members for members, target in diff["assignments"] if target is None]
+    new_families = [
+        Family(
+            name=members[0]["family"],
+            name_normalized=members[0]["name_normalized"],
+            vendor=members[0]["vendor"],
+            panose=members[0]["panose"],
+        )
+        for members in new_clusters
+    ]
+    db.add_all(new_families)
+    db.flush()
+    new_ids = iter(fam.id for fam in new_families)
+
+    current_names = dict(db.query(Family.id, Family.name_normalized).all())
+    font_updates = []
+    family_updates = []
+    touched = set()
+    for members, target in diff["assignments"]:
+        if target is None:
+            target = next(new_ids)
+        elif current_names.get(target) != members[0]["name_normalized"]:
+            family_updates.append({"id": target, "name_normalized": members[0]["name_normalized"]})
+        for f in members:
+            if f["family_id"] != target:
+                font_updates.append({"id": f["id"], "family_id": target})
+                touched.update((target, f["family_id"]))
+
+    # 2. Déplacements et renommages en masse
+    db.bulk_update_mappings(Font, font_updates)
+    db.bulk_update_mappings(Family, family_updates)
+
+    # 3. Familles vidées par une fusion
+    removed = diff["removed_families"]
+    if removed:
+        db.query(Family).filter(Family.id.in_(removed)).delete(synchronize_session=False)
+
+    # 4. Représentants devenus invalides
+    touched -= set(removed)
+    touched.discard(None)
+    rows = (
+        db.query(Family.id, Font.family_id)
+        .outerjoin(Font, Font.id == Family.representative_id)
+        .filter(Family.id.in_(touched))
+        .all()
+    )
+    stale = {
+        fam_id: {"id": fam_id, "representative_id": None}
+        for fam_id, rep_family in rows
+        if rep_family != fam_id
+    }
+    if stale:
+        db.query(Family).filter(Family.id.in_(list(stale))).update(
+            {"representative_id": None}, synchronize_session=False
+        )
+
+    representative_fallback(db, stale)
+    refresh_family_stats(db, touched)
+    index_families(db, removed)
+    refresh_facets(db, removed)
+    db.commit()
+    return stats
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Recluster every font into families")
+    parser.add_argument("--dry-run", action="store_true", help="Show the diff without applying it")
+    args = parser.parse_args(argv)
+
+    from backend.core.db import SessionLocal  # type: ignore
+
+    with SessionLocal() as db:
+        stats = regroup(db, dry_run=args.dry_run)
+
+    for key, value in stats.items():
+        print(f"{key:<18}: {value}")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -1,69 +1,65 @@
 from pathlib import Path
-import re
 from sqlalchemy.orm import Session
 from backend.models.font import Font, Family
-from backend.scripts.subset import subset
-
-# Dossier subset
-SUBSET_DIR = Path(r"C:\Users\fredm\Code\Specimen\backend\subset")
-SUBSET_DIR.mkdir(parents=True, exist_ok=True)
-
-# Même sanitization que celle utilisée lors de la création des fichiers subset
-def _sanitize_filename(name: str) -> str:
-    name = re.sub(r"[<>:\\/|?*]", "-", name)
-    name = re.sub(r"\s+", " ", name).strip()
-    name = name.replace(" ", "-")
-    name = re.sub(r"-+", "-", name)
-    return name or "font"
+from backend.models.subset import Subset
+from backend.crud.subset import record_subset
+from backend.scripts.subset import SUBSET_FOLDER, subset, subset_key, options_hash, file_digest
 
 
 def repair_missing_subsets(db: Session):
-    families = db.query(Family).all()
+    """Diff entre représentants, manifeste et disque ; ne régénère que ce qui manque."""
+    families = (
+        db.query(Family.id, Family.name, Family.representative_id, Font.path, Font.sha1)
+        .outerjoin(Font, Font.id == Family.representative_id)
+        .all()
+    )
+    # Lignes sans hash de contenu (antérieures aux URLs immuables) : considérées manquantes
+    manifest = {
+        (font_id, key)
+        for font_id, key in db.query(Subset.font_id, Subset.key).filter(Subset.content_hash.isnot(None))
+    }
+    on_disk = {p.stem for p in SUBSET_FOLDER.glob("*.woff2")}
 
     total = len(families)
     repaired = 0
     missing = 0
     failed = 0
 
-    for fam in families:
-        # Nom du fichier attendu
-        sanitized_name = _sanitize_filename(fam.name or "font")
-        expected_file = SUBSET_DIR / f"{sanitized_name}.woff2"
-
-        if expected_file.exists():
-            continue  # OK, rien à faire
-
-        missing += 1
-        print(f"[MISSING] Subset manquant pour famille '{fam.name}' (ID {fam.id})")
-
+    for fam_id, fam_name, rep_id, font_path, font_sha1 in families:
         # Si aucune font représentante
-        if fam.representative_id is None:
-            print(f"  └─ Aucun representative_id, impossible de régénérer.")
+        if rep_id is None:
             continue
 
-        font = db.query(Font).filter(Font.id == fam.representative_id).first()
-        if not font:
-            print(f"  └─ Police représentante introuvable dans la base (id={fam.representative_id})")
-            # On pourrait également nettoyer representative_id ici
-            db.query(Family).filter_by(id=fam.id).update({"representative_id": None})
+        if font_path is None:
+            print(f"[MISSING] Police représentante introuvable pour '{fam_name}' (id={rep_id})")
+            db.query(Family).filter_by(id=fam_id).update({"representative_id": None})
             failed += 1
             continue
 
-        font_path = Path(font.path)
-        if not font_path.exists():
-            print(f"  └─ Fichier source introuvable : {font_path}")
-            db.query(Family).filter_by(id=fam.id).update({"representative_id": None})
+        key = subset_key(font_sha1)
+        if (rep_id, key) in manifest and key in on_disk:
+            continue  # OK, rien à faire
+
+        missing += 1
+        print(f"[MISSING] Subset manquant pour famille '{fam_name}' (ID {fam_id})")
+
+        source = Path(font_path)
+        if not source.exists():
+            print(f"  └─ Fichier source introuvable : {source}")
+            db.query(Family).filter_by(id=fam_id).update({"representative_id": None})
             failed += 1
             continue
 
         # Tentative de régénération
-        result = subset(font_path)
+        result = subset(source, key)
         if result and result.exists():
-            print(f"  [OK] Subset recréé pour '{fam.name}' → {result.name}")
+            size, content_hash = file_digest(result)
+            record_subset(db, fam_id, rep_id, key, size, options_hash(), content_hash)
+            print(f"  [OK] Subset recréé pour '{fam_name}' → {result.name}")
             repaired += 1
         else:
-            print(f"  [FAIL] Subset échoué pour '{fam.name}'")
-            db.query(Family).filter_by(id=fam.id).update({"representative_id": None})
+            print(f"  [FAIL] Subset échoué pour '{fam_name}'")
+            db.query(Family).filter_by(id=fam_id).update({"representative_id": None})
             failed += 1
 
     db.commit()
@@ -1,7 +1,7 @@
 from pathlib import Path
 from sqlalchemy.orm import Session
 from backend.models.font import Family, Font
-from backend.scripts.subset import subset
+from backend.scripts.subset_queue import request_subset
 
 
 
@@ -41,7 +41,9 @@ def representative(font_obj, family_entry, representative_cache) -> bool:
     
     return False
 
-def representative_fallback(db: Session, families_cache: dict) -> None:
+def representative_fallback(db: Session, families_cache: dict) -> list[int]:
+    """Choisit un représentant pour les familles qui n'en ont pas ; retourne leurs ids. Caller commits."""
+    updated = []
     for fam_key, fam_entry in families_cache.items():
         # Si la famille a déjà un représentant, on skip
         if fam_entry.get("representative_id"):
@@ -51,8 +53,17 @@ def representative_fallback(db: Session, families_cache: dict) -> None:
         if not family_id:
             continue  # devrait être rare
 
-        # Récupérer toutes les fonts liées à la famille
-        fonts = db.query(Font).filter(Font.family_id == family_id).all()
+        # Récupérer toutes les fonts liées à la famille (hors doublons d'un autre format et fichiers disparus)
+        fonts = (
+            db.query(Font)
+            .filter(
+                Font.family_id == family_id,
+                Font.canonical_id.is_(None),
+                Font.status.is_distinct_from("missing"),
+            )
+            .order_by(Font.id)
+            .all()
+        )
         if not fonts:
             continue
 
@@ -78,8 +89,12 @@ def representative_fallback(db: Session, families_cache: dict) -> None:
         db.query(Family).filter(Family.id == family_id).update(
             {"representative_id": representative_font.id}
         )
+        updated.append(family_id)
 
-        # Générer subset
-        subset(Path(representative_font.path))
+        # Subset généré en arrière-plan
+        request_subset(
+            db, family_id, representative_font.id,
+            Path(representative_font.path), representative_font.sha1,
+        )
 
-    db.commit()
\ No newline at end of file
+    return updated
\ No newline at end of file
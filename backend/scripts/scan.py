@@ -1,140 +1,765 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 from datetime import datetime, timezone
+from hashlib import sha1
+import os
+import threading
+from types import SimpleNamespace
+from sqlalchemy import String, and_, case, cast, insert, literal, not_, or_, update
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
+from backend.core.db import ingest_lock
 from backend.models.font import Font, Family
-from backend.scripts.group import group
+from backend.models.file_index import FileIndex
+from backend.models.subset import Subset
+from backend.crud.family import refresh_family_stats
+from backend.scripts.group import group, FamilyIndex
 from backend.scripts.extract import extract
 from backend.scripts.representative import representative, representative_fallback
-from backend.scripts.subset import subset
+from backend.scripts.sha_index import shared_index
+from backend.scripts.subset_queue import request_subsets
 
 
 FONT_EXTENSIONS = [".ttf", ".otf", ".woff", ".woff2", ".svg"]
 
-class SHA1Cache:
-    def __init__(self, db: Session, threshold: int = 1000):
+BATCH_SIZE = 500
+
+# Champs d'extract() recopiés tels quels dans fonts
+FONT_COLUMNS = (
+    "path", "sha1", "fingerprint", "format", "full_name", "style_name", "weight_class", "width_class",
+    "units_per_em", "ascender", "descender", "line_gap", "x_height", "cap_height", "italic_angle",
+)
+
+class FileIndexCache:
+    """Signatures (size, mtime_ns, inode) -> sha1 des fichiers déjà vus sous une racine.
+
+    Avec `paths` (scan incrémental), seules les entrées de ces fichiers sont chargées ;
+    les candidats à un déplacement sont alors cherchés en base, signature par signature.
+    """
+
+    def __init__(self, db: Session, root: Path, paths: list[Path] | None = None, chunk: int = 500):
         self.db = db
-        self.threshold = threshold
-        self.cache = None
-        self.use_cache = False
-
-    def initialize(self, total_fonts: int):
-        if total_fonts > self.threshold:
-            self.cache = {s for (s,) in self.db.query(Font.sha1).all()}
-            self.use_cache = True
+        self.root = root
+        query = db.query(
+            FileIndex.path, FileIndex.size, FileIndex.mtime_ns, FileIndex.inode, FileIndex.sha1,
+            Font.id.isnot(None),
+        ).outerjoin(Font, Font.sha1 == FileIndex.sha1)
+        if paths is None:
+            rows = query.filter(under(FileIndex.path, root)).all()
         else:
-            self.use_cache = False
-
-    def has(self, sha1: str) -> bool:
-        if self.use_cache:
-            return sha1 in self.cache
-        return (
-            self.db.query(Font.id)
-            .filter(Font.sha1 == sha1)
-            .limit(1)
-            .scalar()
-            is not None
+            keys = [str(path) for path in paths]
+            rows = [row for i in range(0, len(keys), chunk) for row in query.filter(FileIndex.path.in_(keys[i:i + chunk]))]
+        self.entries = {path: (size, mtime_ns, inode, sha) for path, size, mtime_ns, inode, sha, _ in rows}
+        # Chemins dont le sha1 est encore au catalogue : inutile de le revérifier fichier par fichier
+        self.cataloged = {path for path, *_, has_font in rows if has_font}
+        # (size, mtime_ns) -> entrées cataloguées, pour retrouver un fichier déplacé
+        self.signatures = {}
+        self.partial = paths is not None
+        if not self.partial:
+            for path, size, mtime_ns, inode, sha, has_font in rows:
+                if has_font:
+                    self.signatures.setdefault((size, mtime_ns), []).append((path, inode, sha))
+        self.claimed = set()
+        self.pending = []
+
+    def lookup(self, path: Path, st: os.stat_result) -> str | None:
+        """Return the indexed sha1 if the file is unchanged and its font still cataloged."""
+        key = str(path)
+        entry = self.entries.get(key)
+        if entry and key in self.cataloged and entry[:3] == file_signature(st):
+            return entry[3]
+        return None
+
+    def moved(self, path: Path, st: os.stat_result) -> tuple[str, str] | None:
+        """Return (old_path, sha1) if this new file is an indexed file that left its old path.
+
+        Même inode : déplacement sur le même volume, rien n'est lu ; l'ancien chemin
+        peut être occupé par un autre fichier (échange de noms). Inode différent (copie
+        entre volumes qui garde le mtime) : l'ancien chemin doit avoir disparu et le
+        sha1 du fichier tranche, sans parsing.
+        """
+        key = str(path)
+        for old_path, inode, sha in self._signature(st.st_size, st.st_mtime_ns):
+            if old_path == key or old_path in self.claimed:
+                continue
+            try:
+                old_inode = os.stat(old_path).st_ino
+            except OSError:
+                old_inode = None
+            if inode == st.st_ino:
+                if old_inode == inode:
+                    continue  # lien physique : le fichier est toujours là
+            elif old_inode is not None or file_sha1(path) != sha:
+                continue
+            self.claimed.add(old_path)
+            return old_path, sha
+        return None
+
+    def _signature(self, size: int, mtime_ns: int) -> list[tuple[str, int, str]]:
+        """Cataloged entries under the root with this (size, mtime_ns)."""
+        if self.partial and (size, mtime_ns) not in self.signatures:
+            self.signatures[size, mtime_ns] = (
+                self.db.query(FileIndex.path, FileIndex.inode, FileIndex.sha1)
+                .filter(
+                    FileIndex.size == size, FileIndex.mtime_ns == mtime_ns, under(FileIndex.path, self.root),
+                    FileIndex.sha1.in_(self.db.query(Font.sha1)),
+                )
+                .all()
+            )
+        return self.signatures.get((size, mtime_ns), ())
+
+    def record(self, path: str, st: os.stat_result, sha: str):
+        size, mtime_ns, inode = file_signature(st)
+        self.entries[path] = (size, mtime_ns, inode, sha)
+        self.cataloged.add(path)
+        self.pending.append(
+            {"path": path, "size": size, "mtime_ns": mtime_ns, "inode": inode, "sha1": sha}
         )
-    
-    def add(self, sha1: str):
-        if self.use_cache:
-            self.cache.add(sha1)
-
-
-def scan(db: Session, input_path: Path):
-    print('received')
-    font_paths = [p for ext in FONT_EXTENSIONS for p in input_path.rglob(f"*{ext}")]
-    total_fonts = len(font_paths)
-
-    sha_cache = SHA1Cache(db)
-    sha_cache.initialize(total_fonts)
-    
-    families_cache = {
-        (f.name_normalized, f.vendor, tuple(f.panose or [])): {
-            "id": f.id,
-            "representative_id": f.representative_id,
-            "vendor": f.vendor,
-            "panose": f.panose,
-            "name_normalized": f.name_normalized,
-        }
-        for f in db.query(Family).all()
-    }
 
-    rep_rows = db.query(Family.id, Family.representative_id).all()
-    representative_cache = {fid: rid for (fid, rid) in rep_rows}
+    def flush(self):
+        if not self.pending:
+            return
+        stmt = sqlite_insert(FileIndex)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FileIndex.path],
+            set_={
+                "size": stmt.excluded.size,
+                "mtime_ns": stmt.excluded.mtime_ns,
+                "inode": stmt.excluded.inode,
+                "sha1": stmt.excluded.sha1,
+            },
+        )
+        self.db.execute(stmt, self.pending)
+        self.pending = []
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def under(column, folder):
+    """Condition: `column` holds a path below `folder`.
+
+    Intervalle [prefix, prefix avec le séparateur incrémenté) plutôt que LIKE : ni
+    jokers (_ et % dans les noms de dossiers), ni comparaison insensible à la casse,
+    et l'index sur path sert directement.
+    """
+    prefix = str(folder).rstrip(os.sep) + os.sep
+    return and_(column >= prefix, column < prefix[:-1] + chr(ord(os.sep) + 1))
+
+
+def file_signature(st: os.stat_result) -> tuple[int, int, int]:
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def file_sha1(path: Path) -> str | None:
+    try:
+        return sha1(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def touch_fonts(db: Session, shas: list[str], chunk: int = 500) -> set[int]:
+    """Bump last_scan for already known fonts (and lift their tombstone), one UPDATE per chunk.
 
-    count = 0
-    for font_path in font_paths:
-        if font_path.name.startswith("._"):
-            print(f"[skip] Resource fork: {font_path.name}")
+    Retourne les familles dont une font sort de la tombe : leurs stats sont à refaire.
+    """
+    now = datetime.now(timezone.utc)
+    revived = set()
+    for i in range(0, len(shas), chunk):
+        part = shas[i:i + chunk]
+        revived.update(
+            fid for (fid,) in db.query(Font.family_id).filter(Font.sha1.in_(part), Font.status == "missing")
+        )
+        db.query(Font).filter(Font.sha1.in_(part)).update(
+            {"last_scan": now, "status": "ok"}, synchronize_session=False
+        )
+    return revived
+
+
+def is_font_file(path: Path) -> bool:
+    return path.suffix.lower() in FONT_EXTENSIONS and not path.name.startswith("._")
+
+
+def path_conditions(paths: Iterable[Path], chunk: int = 500) -> list:
+    """Font.path conditions matching these files, or anything under them for folders."""
+    files, folders = [], []
+    for path in paths:
+        (files if path.suffix.lower() in FONT_EXTENSIONS else folders).append(str(path))
+
+    conditions = [Font.path.in_(files[i:i + chunk]) for i in range(0, len(files), chunk)]
+    conditions += [under(Font.path, folder) for folder in folders]
+    return conditions
+
+
+def tombstone_fonts(db: Session, paths: Iterable[Path], chunk: int = 500) -> tuple[int, set[int]]:
+    """Mark the fonts stored at (or under) these paths as missing. Caller commits.
+
+    La ligne reste au catalogue avec son sha1 et ses métadonnées : si le fichier
+    réapparaît ailleurs, le scan la relocalise au lieu de la réextraire. Une famille
+    dont le représentant disparaît repasse sans représentant. Retourne le nombre de
+    fonts marquées et les ids des familles touchées.
+    """
+    count, touched = 0, set()
+    for condition in path_conditions(paths, chunk):
+        rows = db.query(Font.id, Font.family_id).filter(condition, Font.status.is_distinct_from("missing")).all()
+        if not rows:
             continue
+        ids = [font_id for font_id, _ in rows]
+        touched.update(family_id for _, family_id in rows if family_id is not None)
+        for i in range(0, len(ids), chunk):
+            part = ids[i:i + chunk]
+            db.query(Font).filter(Font.id.in_(part)).update({"status": "missing"}, synchronize_session=False)
+            db.query(Family).filter(Family.representative_id.in_(part)).update(
+                {"representative_id": None}, synchronize_session=False
+            )
+        count += len(ids)
+    return count, touched
 
-        data = extract(font_path)
-        if not data:
+
+def relocate_fonts(db: Session, moves: dict[str, str], chunk: int = 500) -> tuple[int, set[int]]:
+    """Point the fonts stored at the old paths (keys) to their new paths. Caller commits.
+
+    Les chemins passent d'abord par une valeur temporaire unique : un échange
+    (a -> b, b -> a) ne heurte pas l'unicité de path. La font redevient "ok".
+    Retourne le nombre de fonts déplacées et les familles dont une font sort de la tombe.
+    """
+    items = list(moves.items())
+    ids, revived = {}, set()
+    for i in range(0, len(items), chunk):
+        olds = [old for old, _ in items[i:i + chunk]]
+        rows = db.query(Font.path, Font.id, Font.family_id, Font.status).filter(Font.path.in_(olds)).all()
+        found = {path: font_id for path, font_id, _, _ in rows}
+        revived.update(family_id for _, _, family_id, status in rows if status == "missing")
+        if found:
+            db.query(Font).filter(Font.id.in_(list(found.values()))).update(
+                {"path": literal(":moving:") + cast(Font.id, String)}, synchronize_session=False
+            )
+            ids.update(found)
+        db.query(FileIndex).filter(FileIndex.path.in_(olds)).delete(synchronize_session=False)
+
+    now = datetime.now(timezone.utc)
+    targets = [(ids[old], new) for old, new in items if old in ids]
+    for i in range(0, len(targets), chunk):
+        part = dict(targets[i:i + chunk])
+        db.execute(
+            update(Font)
+            .where(Font.id.in_(list(part)))
+            .values(path=case(part, value=Font.id), status="ok", last_scan=now)
+        )
+    return len(targets), revived
+
+
+def remove_fonts(db: Session, paths: Iterable[Path], chunk: int = 500) -> tuple[set[int], set[str]]:
+    """Delete the fonts stored at these paths, or under them for folders. Caller commits.
+
+    Les familles dont le représentant disparaît repassent sans représentant ; retourne
+    les ids des familles touchées et les sha1 retirés.
+    """
+    touched, shas = set(), set()
+    for condition in path_conditions(paths, chunk):
+        rows = db.query(Font.id, Font.family_id, Font.path, Font.sha1).filter(condition).all()
+        if not rows:
             continue
+        ids = [font_id for font_id, *_ in rows]
+        touched.update(family_id for _, family_id, *_ in rows if family_id is not None)
+        shas.update(sha1 for *_, sha1 in rows)
+        db.query(Family).filter(Family.representative_id.in_(ids)).update(
+            {"representative_id": None}, synchronize_session=False
+        )
+        db.query(Subset).filter(Subset.font_id.in_(ids)).delete(synchronize_session=False)
+        promote_duplicates(db, ids)
+        db.query(FileIndex).filter(FileIndex.path.in_([p for _, _, p, _ in rows])).delete(
+            synchronize_session=False
+        )
+        db.query(Font).filter(Font.id.in_(ids)).delete(synchronize_session=False)
+    return touched, shas
+
 
-        sha = data["sha1"]
-        if sha_cache.has(sha):
-            existing = db.query(Font).filter_by(sha1=sha).first()
-            if existing:
-                existing.last_scan = datetime.now(timezone.utc)
+def promote_duplicates(db: Session, canonical_ids: list[int]):
+    """Before deleting canonical fonts, make their oldest surviving duplicate the new canonical. Caller commits."""
+    survivors = {}
+    for font_id, canonical_id in (
+        db.query(Font.id, Font.canonical_id)
+        .filter(Font.canonical_id.in_(canonical_ids), Font.id.notin_(canonical_ids))
+        .order_by(Font.id)
+    ):
+        survivors.setdefault(canonical_id, font_id)
+    if not survivors:
+        return
+    db.query(Font).filter(Font.id.in_(list(survivors.values()))).update(
+        {"canonical_id": None}, synchronize_session=False
+    )
+    db.execute(
+        update(Font)
+        .where(Font.canonical_id.in_(list(survivors)))
+        .values(canonical_id=case(survivors, value=Font.canonical_id))
+    )
+
+
+def iter_font_files(root: Path, exclude: Iterable[Path] = ()) -> Iterator[Path]:
+    """Single os.scandir walk of `root`, yielding font files as they are found.
+
+    Les dossiers de `exclude` ne sont pas parcourus.
+    """
+    skip = {str(path) for path in exclude}
+    stack = [str(root)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                subdirs = []
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.path not in skip:
+                                subdirs.append(entry.path)
+                        elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in FONT_EXTENSIONS:
+                            yield Path(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"[error] Cannot read {current}: {e}")
             continue
+        # Ordre de parcours stable : sous-dossiers dans l'ordre alphabétique
+        stack.extend(sorted(subdirs, reverse=True))
+
+
+def extract_all(font_paths: Iterable[Path], workers: int = 1) -> Iterator[tuple[Path, dict | None]]:
+    """Yield (path, extract() result) in input order, serially or from a process pool.
+
+    workers <= 1 keeps everything in-process; 0 or None uses one worker per CPU.
+    The pool only ever holds a bounded window of in-flight files, so `font_paths`
+    can be a lazy walk of any size.
+    """
+    if workers is None or workers == 0:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        for font_path in font_paths:
+            yield font_path, extract(font_path)
+        return
+
+    window = workers * 8
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for font_path in font_paths:
+            in_flight.append((font_path, pool.submit(extract, font_path)))
+            if len(in_flight) >= window:
+                done_path, future = in_flight.popleft()
+                yield done_path, future.result()
+        while in_flight:
+            done_path, future = in_flight.popleft()
+            yield done_path, future.result()
+
+
+def scan(
+    db: Session,
+    input_path: Path,
+    workers: int = 1,
+    progress: Callable[[dict], None] | None = None,
+    cancel: threading.Event | None = None,
+    paths: Iterable[Path] | None = None,
+    removed: Iterable[Path] | None = None,
+    exclude: Iterable[Path] = (),
+) -> dict:
+    """Scan a folder and return its counters.
+
+    `progress` reçoit les compteurs après chaque fichier ; si `cancel` est levé, le
+    parcours s'arrête et ce qui a déjà été traité est tout de même enregistré.
+    `paths` restreint le scan à ces fichiers de `input_path` et `removed` liste les
+    fichiers ou dossiers disparus (ingestion incrémentale du watcher). Les sous-dossiers
+    de `exclude`, déjà scannés par ailleurs, ne sont ni parcourus ni réconciliés.
+
+    Un contenu connu retrouvé sous un autre chemin déplace sa font sans réextraction ;
+    après un parcours complet, les fonts de `input_path` qui n'ont pas été vues
+    passent au statut "missing".
+    """
+    exclude = list(exclude)
+    paths = None if paths is None else list(paths)
+    counters = {
+        "discovered": 0, "skipped": 0, "extracted": 0, "added": 0, "duplicates": 0,
+        "moved": 0, "missing": 0, "failed": 0, "bytes": 0,
+    }
+
+    def report():
+        if progress:
+            progress(dict(counters))
+
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+
+    sha_cache = None
+
+    # Même forme de clé que group() : le nom de famille normalisé
+    families_cache = FamilyIndex()
+    representative_cache = {}
+    last_family_id = 0
+
+    def sync_families():
+        """Load families created since the last call, by this scan or a concurrent one."""
+        nonlocal last_family_id
+        for f in db.query(Family).filter(Family.id > last_family_id).order_by(Family.id):
+            families_cache.setdefault(f.name_normalized or "", {
+                "id": f.id,
+                "representative_id": f.representative_id,
+                "vendor": f.vendor,
+                "panose": f.panose,
+                "name_normalized": f.name_normalized,
+            })
+            representative_cache.setdefault(f.id, f.representative_id)
+            last_family_id = f.id
+
+    file_index = None
+    unchanged = []
+    stats = {}
+    touched_families = set()
+    seen = set()
+    relocations = {}  # ancien chemin -> nouveau chemin
+    unprinted = set()  # sha1 des fonts cataloguées avant les empreintes, relues une fois
+
+    def forget(removed: list[Path]):
+        families, shas = remove_fonts(db, removed)
+        if sha_cache is not None:
+            for sha1 in shas:
+                sha_cache.discard(sha1)
+        follow_representatives(families)
+
+    def bury(missing: list[Path]):
+        count, families = tombstone_fonts(db, missing)
+        counters["missing"] += count
+        follow_representatives(families)
+
+    def follow_representatives(families: set[int]):
+        # Représentants supprimés ou disparus : les caches suivent la base
+        touched_families.update(families)
+        by_id = {entry.get("id"): entry for entry in families_cache.values()}
+        for fid, rid in db.query(Family.id, Family.representative_id).filter(Family.id.in_(families)):
+            representative_cache[fid] = rid
+            if fid in by_id:
+                by_id[fid]["representative_id"] = rid
+
+    def candidates():
+        for font_path in (iter_font_files(input_path, exclude) if paths is None else paths):
+            if cancelled():
+                return
+            counters["discovered"] += 1
+            seen.add(str(font_path))
+            if font_path.name.startswith("._"):
+                print(f"[skip] Resource fork: {font_path.name}")
+                counters["skipped"] += 1
+                continue
+            try:
+                st = font_path.stat()
+            except OSError as e:
+                print(f"[error] Cannot stat {font_path}: {e}")
+                counters["failed"] += 1
+                continue
+            counters["bytes"] += st.st_size
 
-        family_key, is_new_family = group(data, families_cache)
-
-        if is_new_family:
-            new_family = Family(
-                name=data["family"],
-                name_normalized=data["family_normalized"],
-                vendor=data.get("vendor"),
-                panose=data.get("panose"),
-                code_page1=data.get("code_page1"),
-                code_page2=data.get("code_page2"),
-                glyph_count=data.get("glyph_count"),
+            # Fichier inchangé depuis le dernier scan : ni lecture, ni parsing
+            known_sha = file_index.lookup(font_path, st)
+            if not known_sha:
+                # Fichier déplacé ou renommé : la font suit, rien n'est réextrait
+                moved = file_index.moved(font_path, st)
+                if moved:
+                    old_path, known_sha = moved
+                    relocations[old_path] = str(font_path)
+                    file_index.record(str(font_path), st, known_sha)
+            if known_sha and known_sha not in unprinted:
+                unchanged.append(known_sha)
+                counters["skipped"] += 1
+                if counters["skipped"] % BATCH_SIZE == 0:
+                    report()
+                continue
+            stats[font_path] = st
+            yield font_path
+
+    def write(batch):
+        """Persist one batch: bulk INSERT ... RETURNING for families and fonts, set-based updates."""
+        extracted = []
+        for font_path, data in batch:
+            st = stats.pop(font_path)
+            if not data:
+                counters["failed"] += 1
+                continue
+            counters["extracted"] += 1
+            previous = file_index.entries.get(data["path"])
+            if previous and previous[3] != data["sha1"]:
+                # Contenu modifié sur place : l'ancienne font laisse la place à la nouvelle
+                forget([Path(data["path"])])
+            file_index.record(data["path"], st, data["sha1"])
+            extracted.append(data)
+
+        known = sha_cache.known(data["sha1"] for data in extracted)
+        if known:
+            # Contenu connu sous un autre chemin (copie entre volumes, mtime changé) :
+            # la font suit si son fichier a disparu
+            held = dict(db.query(Font.sha1, Font.path).filter(Font.sha1.in_(known)).all())
+            for data in extracted:
+                old_path = held.get(data["sha1"])
+                if (
+                    old_path and old_path != data["path"] and old_path not in relocations
+                    and not os.path.exists(old_path)
+                ):
+                    relocations[old_path] = data["path"]
+        # Faces déjà au catalogue sous un autre conteneur : fingerprint -> (font_id, family_id)
+        fingerprints = {data["fingerprint"] for data in extracted if data.get("fingerprint")}
+        canonicals = {
+            fp: (font_id, family_id)
+            for fp, font_id, family_id in db.query(Font.fingerprint, Font.id, Font.family_id).filter(
+                Font.fingerprint.in_(fingerprints), Font.canonical_id.is_(None)
             )
-            db.add(new_family)
-            db.flush()
+        } if fingerprints else {}
+        if known:
+            # Avant les nouvelles fonts : une copie d'une autre forme doit trouver sa canonique
+            backfill_fingerprints(extracted, known, canonicals)
 
-            families_cache[family_key]["id"] = new_family.id
-            family_id = new_family.id
-        else:
-            family_id = families_cache[family_key]["id"]
-
-        # Map only valid fields for Font ORM
-        allowed_keys = {
-            "path",
-            "sha1",
-            "format",
-            "full_name",
-            "style_name",
-            "weight_class",
-            "width_class",
-            "units_per_em",
-            "ascender",
-            "descender",
-            "line_gap",
-            "x_height",
-            "cap_height",
-            "italic_angle",
-        }
-        font_data = {k: data.get(k) for k in allowed_keys}
-        font_obj = Font(family_id=family_id, **font_data)
-        db.add(font_obj)
-        db.flush()
-
-        if representative(font_obj, families_cache[family_key], representative_cache):
-            families_cache[family_key]["representative_id"] = font_obj.id
-            representative_cache[family_id] = font_obj.id
-            db.query(Family).filter_by(id=family_id).update(
-                {"representative_id": font_obj.id}
+        new_fonts, new_families, duplicates = [], [], []
+        for data in extracted:
+            if data["sha1"] in known:
+                # Doublon d'une font déjà au catalogue (ou déjà vue dans ce lot)
+                unchanged.append(data["sha1"])
+                continue
+            known.add(data["sha1"])
+
+            fingerprint = data.get("fingerprint")
+            if fingerprint and fingerprint in canonicals:
+                # Même face, autre format : rattachée à la font canonique, sans regroupement
+                duplicates.append(data)
+                continue
+            if fingerprint:
+                canonicals[fingerprint] = None  # canonique de ce lot, id connu après l'INSERT
+
+            family_key, is_new_family = group(data, families_cache)
+            if is_new_family:
+                new_families.append((family_key, {
+                    "name": data["family"],
+                    "name_normalized": data["family_normalized"],
+                    "vendor": data.get("vendor"),
+                    "panose": data.get("panose"),
+                    "code_page1": data.get("code_page1"),
+                    "code_page2": data.get("code_page2"),
+                    "glyph_count": data.get("glyph_count"),
+                }))
+            new_fonts.append((family_key, data))
+
+        if new_families:
+            family_ids = db.scalars(
+                insert(Family).returning(Family.id, sort_by_parameter_order=True),
+                [row for _, row in new_families],
+            ).all()
+            for (family_key, _), family_id in zip(new_families, family_ids):
+                families_cache[family_key]["id"] = family_id
+
+        if new_fonts:
+            insert_fonts(new_fonts, canonicals)
+        if duplicates:
+            link_duplicates(duplicates, canonicals)
+
+    def backfill_fingerprints(extracted: list[dict], known: set[str], canonicals: dict):
+        """Fingerprint known fonts cataloged without one, linking them to an existing canonical face.
+
+        NULL = jamais calculée ; '' = pas d'empreinte possible (svg...), pour ne pas relire.
+        """
+        by_sha = {data["sha1"]: data for data in extracted if data["sha1"] in known}
+        rows = db.query(Font.id, Font.sha1, Font.family_id).filter(
+            Font.sha1.in_(list(by_sha)), Font.fingerprint.is_(None)
+        ).all()
+        fingerprints, duplicates = {}, {}
+        for font_id, sha1, family_id in rows:
+            unprinted.discard(sha1)
+            fingerprint = by_sha[sha1].get("fingerprint") or ""
+            fingerprints[font_id] = fingerprint
+            if not fingerprint:
+                continue
+            canonical = canonicals.get(fingerprint)
+            if canonical and canonical[0] != font_id:
+                # Même face déjà au catalogue sous un autre conteneur : devient son doublon
+                duplicates[font_id] = canonical
+                touched_families.update((family_id, canonical[1]))
+            else:
+                canonicals[fingerprint] = (font_id, family_id)
+        if fingerprints:
+            db.execute(
+                update(Font)
+                .where(Font.id.in_(list(fingerprints)))
+                .values(fingerprint=case(fingerprints, value=Font.id))
+            )
+        if duplicates:
+            db.execute(
+                update(Font)
+                .where(Font.id.in_(list(duplicates)))
+                .values(
+                    canonical_id=case({fid: c[0] for fid, c in duplicates.items()}, value=Font.id),
+                    family_id=case({fid: c[1] for fid, c in duplicates.items()}, value=Font.id),
+                )
+            )
+            # Un doublon n'est jamais représentant
+            families = {fid for (fid,) in db.query(Family.id).filter(Family.representative_id.in_(list(duplicates)))}
+            db.query(Family).filter(Family.id.in_(families)).update(
+                {"representative_id": None}, synchronize_session=False
             )
-            subset(Path(font_obj.path))
+            follow_representatives(families)
 
-        sha_cache.add(sha)
-        
-        count += 1
-        if count % 100 == 0:
+    def font_row(data: dict, family_id: int | None) -> dict:
+        row = {k: data.get(k) for k in FONT_COLUMNS}
+        row["fingerprint"] = data.get("fingerprint") or ""
+        row.update(
+            family_id=family_id,
+            family_name=data.get("family"),
+            family_normalized=data.get("family_normalized"),
+            panose=data.get("panose"),
+        )
+        return row
+
+    def insert_fonts(new_fonts, canonicals: dict):
+        rows = [font_row(data, families_cache[family_key]["id"]) for family_key, data in new_fonts]
+        font_ids = db.scalars(
+            insert(Font).returning(Font.id, sort_by_parameter_order=True), rows
+        ).all()
+
+        # Représentants dans l'ordre d'arrivée, appliqués en un seul UPDATE
+        representatives = {}
+        for (family_key, _), row, font_id in zip(new_fonts, rows, font_ids):
+            font = SimpleNamespace(id=font_id, **row)
+            family_id = row["family_id"]
+            touched_families.add(family_id)
+            sha_cache.add(row["sha1"])
+            counters["added"] += 1
+            if row["fingerprint"]:
+                canonicals[row["fingerprint"]] = (font_id, family_id)
+            if representative(font, families_cache[family_key], representative_cache):
+                families_cache[family_key]["representative_id"] = font_id
+                representative_cache[family_id] = font_id
+                representatives[family_id] = font
+        if representatives:
+            db.execute(
+                update(Family)
+                .where(Family.id.in_(list(representatives)))
+                .values(representative_id=case(
+                    {fid: font.id for fid, font in representatives.items()}, value=Family.id
+                ))
+            )
+            request_subsets(db, [
+                (family_id, font.id, Path(font.path), font.sha1) for family_id, font in representatives.items()
+            ])
+
+    def link_duplicates(duplicates: list[dict], canonicals: dict):
+        rows = []
+        for data in duplicates:
+            canonical_id, family_id = canonicals[data["fingerprint"]]
+            row = font_row(data, family_id)
+            row["canonical_id"] = canonical_id
+            rows.append(row)
+            # La famille gagne un format, pas une font
+            touched_families.add(family_id)
+            sha_cache.add(row["sha1"])
+            counters["duplicates"] += 1
+        db.execute(insert(Font), rows)
+
+    def relocate():
+        if not relocations:
+            return
+        moves = dict(relocations)
+        relocations.clear()
+        # Un autre contenu occupait le nouveau chemin : il a été remplacé
+        news = list(moves.values())
+        replaced = [
+            path
+            for i in range(0, len(news), BATCH_SIZE)
+            for path, sha in db.query(Font.path, Font.sha1).filter(Font.path.in_(news[i:i + BATCH_SIZE]))
+            if path not in moves and file_index.entries.get(path, (None,) * 4)[3] != sha
+        ]
+        if replaced:
+            forget([Path(path) for path in replaced])
+        moved, revived = relocate_fonts(db, moves)
+        counters["moved"] += moved
+        touched_families.update(revived)
+
+    def reconcile():
+        """After a full walk: relocate or tombstone the fonts of input_path that were not seen."""
+        query = db.query(Font.path, Font.sha1).filter(under(Font.path, input_path))
+        if exclude:
+            query = query.filter(not_(or_(*[under(Font.path, folder) for folder in exclude])))
+        rows = query.all()
+        unseen = [(path, sha) for path, sha in rows if path not in seen and path not in relocations]
+        if not unseen:
+            return
+        # Chemin vu sans font propre (copie identique) : la font peut s'y installer
+        held = {path for path, _ in rows} | set(relocations.values())
+        free = {}
+        for path in seen - held:
+            entry = file_index.entries.get(path)
+            if entry:
+                free.setdefault(entry[3], path)
+        missing = []
+        for path, sha in unseen:
+            new_path = free.pop(sha, None)
+            if new_path:
+                relocations[path] = new_path
+            else:
+                missing.append(Path(path))
+        bury(missing)
+
+    def flush():
+        # Avant file_index.flush() : relocate_fonts() retire les entrées des anciens chemins
+        relocate()
+        touched_families.update(touch_fonts(db, unchanged))
+        unchanged.clear()
+        file_index.flush()
+        refresh_family_stats(db, touched_families)
+        touched_families.clear()
+        db.commit()
+        # Les Font déjà écrites ne servent plus : identity map bornée au batch
+        db.expunge_all()
+
+    # Lecture et parsing hors verrou ; seule l'écriture de chaque lot est exclusive,
+    # ce qui laisse plusieurs scans tourner en parallèle sur une même base
+    with ingest_lock:
+        sync_families()
+        # Disparitions d'abord, en pierre tombale plutôt qu'en suppression : un fichier
+        # déplacé réapparaît ensuite sous son nouveau chemin et sa font le suit
+        if removed:
+            bury(list(removed))
+            refresh_family_stats(db, touched_families)
+            touched_families.clear()
             db.commit()
-    
-    representative_fallback(db, families_cache)
-    db.commit()
+        # Instance partagée du process, toujours manipulée sous le verrou
+        sha_cache = shared_index(db)
+    # Index chargé après les disparitions : leurs entrées servent à reconnaître les déplacements
+    file_index = FileIndexCache(db, input_path, paths)
+    # Fonts sans empreinte (antérieures à la colonne) : relues une fois, même inchangées
+    scope = [under(Font.path, input_path)] if paths is None else path_conditions(paths)
+    for condition in scope:
+        unprinted.update(sha1 for (sha1,) in db.query(Font.sha1).filter(Font.fingerprint.is_(None), condition))
+
+    for batch in batched(extract_all(candidates(), workers), BATCH_SIZE):
+        with ingest_lock:
+            sync_families()
+            sha_cache.sync(db)
+            write(batch)
+            flush()
+        report()
+        if cancelled():
+            break
+
+    with ingest_lock:
+        sync_families()
+        touched_families.update(representative_fallback(db, families_cache))
+        if paths is None and not cancelled():
+            reconcile()
+        flush()
+        sha_cache.save(db)
+    report()
+    return counters
@@ -0,0 +1,328 @@
+from datetime import datetime, timezone
+from pathlib import Path
+from uuid import uuid4
+import asyncio
+import os
+import threading
+import time
+import traceback
+
+from backend.core.db import SessionLocal
+from backend.crud.folder import get_folder_by_id, mark_folder, record_folder_totals, scan_folder
+from backend.scripts.scan import scan
+from backend.scripts.subset_queue import subset_queue
+
+FINISHED = ("done", "cancelled", "error")
+MAX_FINISHED_JOBS = 50
+EVENT_INTERVAL = 0.25  # secondes minimum entre deux événements de progression
+MAX_CONCURRENT_SCANS = 4
+# Scans simultanés par périphérique (st_dev) : un partage réseau lent n'occupe que
+# ses propres créneaux, les dossiers des autres disques continuent d'avancer
+DEVICE_CONCURRENCY = 1
+DEVICE_LIMITS = {}  # st_dev -> limite propre, ex. 2 pour un SSD NVMe
+
+
+def device_of(path: Path) -> int:
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return -1
+
+
+def device_limit(device: int) -> int:
+    return DEVICE_LIMITS.get(device, DEVICE_CONCURRENCY)
+
+
+class ScanJobs:
+    """Scans exécutés en tâche de fond par un pool de MAX_CONCURRENT_SCANS threads.
+
+    Un job ne démarre que si son périphérique a un créneau libre (device_limit) ;
+    les écritures restent sérialisées par lot via ingest_lock dans scan().
+
+    Une demande sur un chemin recouvrant un scan en attente ou en cours est rattachée
+    à ce scan (single-flight) : un dossier parent élargit un scan en attente de ses
+    sous-dossiers et y fusionne les autres (annulés, `merged_into` pointe vers lui), un
+    sous-dossier d'un scan en cours réutilise son id. Un dossier parent d'un scan en
+    cours attend sa fin et saute ce sous-dossier s'il s'est terminé. Les dossiers
+    enregistrés ainsi rattachés (`folder_ids`) reçoivent leurs stats à la fin du job.
+    Chaque changement d'état incrémente `seq` et réveille les abonnés SSE.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self._queue = []
+        self._running = {}  # st_dev -> scans en cours
+        self._cond = threading.Condition()
+        self._waiters = {}  # job_id -> {(loop, asyncio.Event)} des abonnés async
+        self._threads = []
+        self._closed = False
+
+    # -------------------------------
+    # API publique
+    # -------------------------------
+
+    def submit(self, path: Path, workers: int = 1, folder_id: int | None = None) -> dict:
+        path = path.resolve()
+        with self._cond:
+            active = self._active()
+            for job in active:
+                current = Path(job["path"])
+                if path == current or current in path.parents:
+                    # Déjà couvert par un scan en attente ou en cours
+                    self._attach(job, path, folder_id)
+                    return self._public(job)
+
+            children = [job for job in active if path in Path(job["path"]).parents]
+            # Sous-dossiers en cours de scan : attendus, puis sautés s'ils se terminent
+            running = [job["id"] for job in children if job["status"] == "running"]
+            pending = [job for job in children if job["status"] == "pending"]
+            if pending:
+                # Le nouveau chemin englobe les scans en attente : le premier est élargi,
+                # les autres y sont fusionnés
+                job, merged = pending[0], pending[1:]
+                job["path"] = str(path)
+                job["folder_id"] = None
+                job["device"] = device_of(path)
+                job["after"] = sorted(set(job["after"]).union(running, *(other["after"] for other in merged)))
+                for other in merged:
+                    job["folder_ids"] += [fid for fid in other["folder_ids"] if fid not in job["folder_ids"]]
+                    other["merged_into"] = job["id"]
+                    self._queue.remove(other["id"])
+                    self._finish(other, "cancelled")
+                self._attach(job, path, folder_id)
+                self._touch(job)
+                return self._public(job)
+
+            job = {
+                "id": uuid4().hex,
+                "path": str(path),
+                "folder_id": folder_id,
+                "folder_ids": [] if folder_id is None else [folder_id],
+                "after": running,
+                "merged_into": None,
+                "device": device_of(path),
+                "workers": workers,
+                "status": "pending",
+                "counters": {},
+                "subsets_pending": 0,
+                "files_per_second": 0.0,
+                "error": None,
+                "created_at": datetime.now(timezone.utc),
+                "started_at": None,
+                "finished_at": None,
+                "seq": 0,
+                "cancel": threading.Event(),
+            }
+            self.jobs[job["id"]] = job
+            self._queue.append(job["id"])
+            self._prune()
+            self._ensure_started()
+            self._cond.notify_all()
+            return self._public(job)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._cond:
+            job = self.jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def list(self) -> list[dict]:
+        with self._cond:
+            return [self._public(job) for job in self.jobs.values()]
+
+    def cancel(self, job_id: str) -> dict | None:
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            if job["status"] == "pending":
+                self._queue.remove(job_id)
+                self._finish(job, "cancelled")
+            elif job["status"] == "running":
+                job["cancel"].set()
+            return self._public(job)
+
+    def wait(self, job_id: str, seq: int, timeout: float) -> dict | None:
+        """Block until the job's seq moves past `seq` (or timeout), then return its state."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: job_id not in self.jobs or self.jobs[job_id]["seq"] > seq, timeout
+            )
+            job = self.jobs.get(job_id)
+            return self._public(job) if job else None
+
+    async def wait_async(self, job_id: str, seq: int, timeout: float) -> dict | None:
+        """Same as wait() for an event loop: no thread is held while waiting."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None or job["seq"] > seq:
+                return self._public(job) if job else None
+            self._waiters.setdefault(job_id, set()).add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[job_id]
+        return self.get(job_id)
+
+    def shutdown(self):
+        """Cancel queued jobs and ask the running scan to stop after its current file."""
+        with self._cond:
+            self._closed = True
+            for job in self._active():
+                if job["status"] == "pending":
+                    self._finish(job, "cancelled")
+                else:
+                    job["cancel"].set()
+            self._queue.clear()
+            self._cond.notify_all()
+
+    # -------------------------------
+    # Helpers internes
+    # -------------------------------
+
+    def _active(self):
+        return [job for job in self.jobs.values() if job["status"] not in FINISHED]
+
+    def _public(self, job: dict) -> dict:
+        return {k: v for k, v in job.items() if k != "cancel" and not k.startswith("_")}
+
+    def _attach(self, job: dict, path: Path, folder_id: int | None):
+        if folder_id is None:
+            return
+        if folder_id not in job["folder_ids"]:
+            job["folder_ids"].append(folder_id)
+        if path == Path(job["path"]) and job["folder_id"] is None:
+            job["folder_id"] = folder_id
+
+    def _touch(self, job: dict):
+        job["seq"] += 1
+        self._cond.notify_all()
+        for loop, event in self._waiters.get(job["id"], ()):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # boucle déjà fermée
+
+    def _finish(self, job: dict, status: str, error: str | None = None):
+        job["status"] = status
+        job["error"] = error
+        job["finished_at"] = datetime.now(timezone.utc)
+        self._touch(job)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in FINISHED]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def _ensure_started(self):
+        while len(self._threads) < MAX_CONCURRENT_SCANS:
+            thread = threading.Thread(target=self._run, name=f"scan-jobs-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_job(self) -> dict | None:
+        """First queued job whose device has a free slot and whose awaited jobs are over (FIFO otherwise)."""
+        for job_id in self._queue:
+            job = self.jobs[job_id]
+            if any(self.jobs.get(other, {}).get("status", "done") not in FINISHED for other in job["after"]):
+                continue
+            if self._running.get(job["device"], 0) < device_limit(job["device"]):
+                return job
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._next_job())
+                if self._closed:
+                    return
+                job = self._next_job()
+                self._queue.remove(job["id"])
+                self._running[job["device"]] = self._running.get(job["device"], 0) + 1
+                # Sous-dossiers scannés entre-temps par un job terminé : inutile de les refaire
+                job["_skip"] = [
+                    Path(self.jobs[other]["path"])
+                    for other in job["after"]
+                    if other in self.jobs and self.jobs[other]["status"] == "done"
+                ]
+                job["status"] = "running"
+                job["started_at"] = datetime.now(timezone.utc)
+                self._touch(job)
+
+            try:
+                counters = self._scan(job)
+                with self._cond:
+                    self._update(job, counters or {})
+                    self._finish(job, "cancelled" if job["cancel"].is_set() else "done")
+            except Exception as e:
+                traceback.print_exc()
+                with self._cond:
+                    self._finish(job, "error", str(e))
+            finally:
+                with self._cond:
+                    self._running[job["device"]] -= 1
+                    self._cond.notify_all()
+
+    def _scan(self, job: dict) -> dict | None:
+        progress = lambda c, j=job: self._progress(j, c)  # noqa: E731
+        path, skip = Path(job["path"]), job["_skip"]
+        with SessionLocal() as db:
+            root = job["folder_id"]
+            if root is not None and path != self._folder_path(db, root):
+                root = None
+            with self._cond:
+                others = [fid for fid in job["folder_ids"] if fid != root]
+            for folder_id in others:
+                mark_folder(db, folder_id, "scanning")
+
+            started = time.monotonic()
+            error = None
+            try:
+                if root is not None:
+                    # Dossier enregistré : mêmes compteurs, plus les stats sur Folder
+                    return scan_folder(
+                        db, root, job["workers"], progress=progress, cancel=job["cancel"], exclude=skip
+                    )
+                return scan(db, path, job["workers"], progress=progress, cancel=job["cancel"], exclude=skip)
+            except Exception as e:
+                db.rollback()
+                error = str(e)
+                raise
+            finally:
+                # Dossiers rattachés au job (sous-dossiers, scan élargi) : stats relues du catalogue
+                with self._cond:
+                    others = [fid for fid in job["folder_ids"] if fid != root]
+                for folder_id in others:
+                    record_folder_totals(db, folder_id, time.monotonic() - started, error)
+
+    @staticmethod
+    def _folder_path(db, folder_id: int) -> Path | None:
+        folder = get_folder_by_id(db, folder_id)
+        return Path(folder.path).resolve() if folder else None
+
+    def _progress(self, job: dict, counters: dict):
+        # Appelé après chaque fichier : les événements sont espacés d'EVENT_INTERVAL
+        now = time.monotonic()
+        if now - job.get("_last_event", 0) < EVENT_INTERVAL:
+            return
+        job["_last_event"] = now
+        with self._cond:
+            self._update(job, counters)
+            self._touch(job)
+
+    def _update(self, job: dict, counters: dict):
+        job["counters"] = counters
+        job["subsets_pending"] = subset_queue.pending()
+        elapsed = (datetime.now(timezone.utc) - job["started_at"]).total_seconds()
+        processed = counters.get("extracted", 0) + counters.get("skipped", 0) + counters.get("failed", 0)
+        job["files_per_second"] = round(processed / elapsed, 1) if elapsed > 0 else 0.0
+
+
+scan_jobs = ScanJobs()
@@ -0,0 +1,245 @@
+from pathlib import Path
+import mmap
+import os
+import struct
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from backend.core.db import DB_PATH, ingest_lock
+from backend.models.font import Font
+
+SHA1_INDEX_PATH = Path(DB_PATH).with_suffix(".sha1idx")
+
+# En-tête : magic, nombre de digests, plus grand Font.id indexé, nombre de fonts
+# au moment de l'écriture, taille du filtre de Bloom en octets
+HEADER = struct.Struct("<8sQQQQ")
+MAGIC = b"SPSHA1\x00\x01"
+DIGEST_SIZE = 20
+BLOOM_BITS_PER_ENTRY = 10
+BLOOM_HASHES = 7  # ~1 % de faux positifs à 10 bits par entrée
+
+
+def _bloom_positions(words: np.ndarray, m_bits: int) -> np.ndarray:
+    """Bit positions of each digest (double hashing on its first two 32-bit words)."""
+    h1 = words[:, 0].astype(np.uint64)
+    h2 = words[:, 1].astype(np.uint64) | np.uint64(1)
+    i = np.arange(BLOOM_HASHES, dtype=np.uint64)
+    return (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(m_bits)
+
+
+class Sha1Index:
+    """Index des sha1 du catalogue : digests binaires triés dans un fichier mmap, devant
+    lequel un filtre de Bloom écarte la plupart des absents sans recherche.
+
+    L'ouverture ne lit que l'en-tête ; les fonts écrites depuis (ou par un scan
+    concurrent) arrivent dans un petit delta en mémoire, fusionné au fichier par
+    `save()`. Si des fonts ont été supprimées depuis l'écriture, le fichier est
+    reconstruit depuis la table fonts.
+
+    Les scans passent par `shared_index()` : une seule instance par process, donc un
+    seul mapping du fichier, ce qui permet de le remplacer (Windows refuse
+    os.replace sur un fichier mappé ailleurs). L'instance partagée ne garde aucune
+    session (chaque appel reçoit celle du thread appelant) et ne se modifie que
+    sous ingest_lock.
+    """
+
+    def __init__(self, db: Session, path: Path = SHA1_INDEX_PATH, shared: bool = False):
+        self.path = Path(path)
+        self.shared = shared
+        self.added = set()
+        self.removed = set()
+        self.last_id = 0
+        self._mmap = None
+        self._digests = np.empty(0, dtype="S20")
+        self._bloom = b"\x00"
+        self._m_bits = 8
+        self._open(db)
+
+    # -------------------------------
+    # API publique (même interface que l'ancien SHA1Cache)
+    # -------------------------------
+
+    def has(self, sha1: str) -> bool:
+        digest = bytes.fromhex(sha1)
+        if digest in self.added:
+            return True
+        if digest in self.removed:
+            return False
+        return self._in_file(digest)
+
+    def known(self, shas) -> set[str]:
+        return {sha for sha in set(shas) if self.has(sha)}
+
+    def add(self, sha1: str):
+        self._check_lock()
+        digest = bytes.fromhex(sha1)
+        if digest in self.removed:
+            self.removed.discard(digest)
+        elif not self._in_file(digest):
+            self.added.add(digest)
+
+    def discard(self, sha1: str):
+        self._check_lock()
+        digest = bytes.fromhex(sha1)
+        self.added.discard(digest)
+        if self._in_file(digest):
+            self.removed.add(digest)
+
+    def refresh(self, db: Session):
+        """Pick up new fonts and rebuild if fonts vanished behind our back."""
+        self.sync(db)
+        font_count = db.query(func.count(Font.id)).scalar()
+        if len(self._digests) + len(self.added) - len(self.removed) != font_count:
+            max_id = db.query(func.max(Font.id)).scalar() or 0
+            self.close()
+            self.added, self.removed = set(), set()
+            self._rebuild(db, max_id, font_count)
+
+    def sync(self, db: Session):
+        """Pick up fonts written since the last sync (this scan or a concurrent one)."""
+        for font_id, sha1 in db.query(Font.id, Font.sha1).filter(Font.id > self.last_id):
+            self.add(sha1)
+            self.last_id = max(self.last_id, font_id)
+
+    def save(self, db: Session):
+        """Merge the in-memory delta into a new sorted file (atomic replace)."""
+        self._check_lock()
+        if not self.added and not self.removed:
+            return
+        digests = self._digests
+        if self.removed:
+            digests = digests[~np.isin(digests, np.array(list(self.removed), dtype="S20"))]
+        if self.added:
+            digests = np.union1d(digests, np.array(list(self.added), dtype="S20"))
+        max_id, font_count = db.query(func.max(Font.id), func.count(Font.id)).one()
+        # Fichier démappé avant remplacement (obligatoire sous Windows)
+        self.close()
+        self.added, self.removed = set(), set()
+        if len(digests) != font_count:
+            # sha1 est unique dans fonts : un écart veut dire qu'une suppression
+            # concurrente nous a échappé, on repart de la table
+            self._rebuild(db, max_id or 0, font_count)
+            return
+        self._write(digests, self.last_id, font_count)
+        self._open(db)
+
+    def close(self):
+        self._digests = np.empty(0, dtype="S20")
+        self._bloom = b"\x00"
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    # -------------------------------
+    # Helpers internes
+    # -------------------------------
+
+    def _check_lock(self):
+        if self.shared and not ingest_lock.locked():
+            raise RuntimeError("the shared sha1 index is only modified under ingest_lock")
+
+    def _in_file(self, digest: bytes) -> bool:
+        if not self._maybe(digest):
+            return False
+        pos = np.searchsorted(self._digests, digest)
+        # Les éléments S20 perdent leurs octets nuls finaux à la lecture
+        return bool(pos < len(self._digests) and self._digests[pos] == digest.rstrip(b"\x00"))
+
+    def _maybe(self, digest: bytes) -> bool:
+        # Même double hachage que _bloom_positions, en entiers Python (pas d'allocation numpy)
+        h1 = int.from_bytes(digest[0:4], "little")
+        h2 = int.from_bytes(digest[4:8], "little") | 1
+        bloom, m_bits = self._bloom, self._m_bits
+        for i in range(BLOOM_HASHES):
+            bit = (h1 + i * h2) % m_bits
+            if not bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def _open(self, db: Session):
+        max_id, font_count = db.query(func.max(Font.id), func.count(Font.id)).one()
+        max_id = max_id or 0
+
+        header = self._read_header()
+        if header is None:
+            self._rebuild(db, max_id, font_count)
+            return
+        _, count, last_id, indexed_count, bloom_bytes = header
+        new_fonts = db.query(func.count(Font.id)).filter(Font.id > last_id).scalar()
+        if indexed_count + new_fonts != font_count:
+            # Des fonts ont disparu depuis l'écriture : le delta ne suffit pas
+            self._rebuild(db, max_id, font_count)
+            return
+
+        self._map(count, bloom_bytes)
+        self.last_id = last_id
+        self.sync(db)
+
+    def _read_header(self):
+        try:
+            with open(self.path, "rb") as f:
+                header = HEADER.unpack(f.read(HEADER.size))
+        except (OSError, struct.error):
+            return None
+        if header[0] != MAGIC:
+            return None
+        return header
+
+    def _map(self, count: int, bloom_bytes: int):
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._bloom = memoryview(self._mmap)[HEADER.size:HEADER.size + bloom_bytes]
+        self._m_bits = bloom_bytes * 8
+        self._digests = np.frombuffer(
+            self._mmap, dtype="S20", count=count, offset=HEADER.size + bloom_bytes
+        )
+
+    def _rebuild(self, db: Session, max_id: int, font_count: int):
+        digests = np.unique(np.array(
+            [bytes.fromhex(sha1) for (sha1,) in db.query(Font.sha1).filter(Font.id <= max_id)],
+            dtype="S20",
+        ))
+        self._write(digests, max_id, font_count)
+        header = self._read_header()
+        self._map(header[1], header[4])
+        self.last_id = max_id
+
+    def _write(self, digests: np.ndarray, last_id: int, font_count: int):
+        m_bits = max(8 * 1024, -(-len(digests) * BLOOM_BITS_PER_ENTRY // 8) * 8)
+        bloom = np.zeros(m_bits // 8, dtype=np.uint8)
+        if len(digests):
+            words = np.frombuffer(digests.tobytes(), dtype="<u4").reshape(-1, DIGEST_SIZE // 4)
+            positions = _bloom_positions(words, m_bits).ravel()
+            np.bitwise_or.at(bloom, positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8))
+
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(digests), last_id, font_count, len(bloom)))
+            f.write(bloom.tobytes())
+            f.write(digests.tobytes())
+        os.replace(tmp, self.path)
+
+
+_shared: Sha1Index | None = None
+
+
+def shared_index(db: Session) -> Sha1Index:
+    """The process-wide index, refreshed against `db`. Caller holds ingest_lock."""
+    global _shared
+    if not ingest_lock.locked():
+        raise RuntimeError("shared_index() is only called under ingest_lock")
+    if _shared is None:
+        _shared = Sha1Index(db, shared=True)
+    else:
+        _shared.refresh(db)
+    return _shared
+
+
+def close_shared():
+    """Unmap the process-wide index (shutdown, tests)."""
+    global _shared
+    with ingest_lock:
+        if _shared is not None:
+            _shared.close()
+            _shared = None
@@ -0,0 +1,201 @@
+import threading
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from backend.models.font import Font, Family
+
+# Colonnes de la matrice de caractéristiques, toutes rapportées à l'UPM ou bornées
+FEATURES = ("x_height", "cap_height", "ascender", "descender", "weight", "width", "slant")
+PANOSE_LENGTH = 10
+PANOSE_WEIGHT = 2.0  # poids de la distance panose face aux métriques standardisées
+PENDING_KEY = "similarity_dirty"  # familles à relire une fois la transaction validée
+
+
+def font_features(row) -> list[float]:
+    upm = row.units_per_em or 0
+
+    def per_em(value):
+        return value / upm if upm > 0 and value is not None else np.nan
+
+    return [
+        per_em(row.x_height),
+        per_em(row.cap_height),
+        per_em(row.ascender),
+        -per_em(row.descender) if row.descender is not None else np.nan,
+        row.weight_class if row.weight_class is not None else np.nan,
+        row.width_class if row.width_class is not None else np.nan,
+        abs(row.italic_angle) if row.italic_angle is not None else np.nan,
+    ]
+
+
+def font_panose(row) -> list[int]:
+    # -1 = inconnu : ne correspond à rien, pas même à un autre inconnu
+    digits = list(row.panose or row.family_panose or [])[:PANOSE_LENGTH]
+    return digits + [-1] * (PANOSE_LENGTH - len(digits))
+
+
+class SimilarityIndex:
+    """Matrice de caractéristiques des fonts, gardée en mémoire pour les plus proches voisins.
+
+    Chargée à la première requête, puis mise à jour par famille : les scans signalent les
+    familles touchées via `invalidate_after_commit()` et seules leurs lignes sont relues
+    avant la requête suivante. Les doublons (`canonical_id`) et les fichiers disparus n'y figurent pas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._loaded = False
+        self._dirty = set()
+        self.columns = self._columns([])
+        self._center = np.zeros(len(FEATURES), dtype=np.float32)
+        self._scale = np.ones(len(FEATURES), dtype=np.float32)
+
+    # -------------------------------
+    # API publique
+    # -------------------------------
+
+    def invalidate(self, family_ids=None):
+        """Mark families for reload, or the whole index when family_ids is None."""
+        with self._lock:
+            if family_ids is None:
+                self._loaded = False
+                self._dirty.clear()
+            elif self._loaded:
+                self._dirty.update(fid for fid in family_ids if fid is not None)
+
+    def invalidate_after_commit(self, db: Session, family_ids):
+        """Invalidate family_ids once db commits; a rollback discards them.
+
+        Invalider avant le commit laisserait une requête concurrente relire l'ancien
+        état et le garder comme à jour.
+        """
+        db.info.setdefault(PENDING_KEY, set()).update(fid for fid in family_ids if fid is not None)
+
+    def similar(
+        self,
+        db: Session,
+        font_id: int,
+        k: int = 20,
+        same_family: bool = False,
+        formats=None,
+        italic: bool | None = None,
+        weight_min: int | None = None,
+        weight_max: int | None = None,
+    ) -> list[tuple[int, float]] | None:
+        """Return the k nearest fonts as (font_id, distance), or None if font_id is unknown."""
+        self._sync(db)
+        with self._lock:
+            c = self.columns
+        ids = c["id"]
+        pos = np.searchsorted(ids, font_id)
+        if pos >= len(ids) or ids[pos] != font_id:
+            return None
+
+        diff = c["features"] - c["features"][pos]
+        distance = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+        mismatches = np.count_nonzero(c["panose"] != c["panose"][pos], axis=1)
+        distance += (PANOSE_WEIGHT / PANOSE_LENGTH) * mismatches
+
+        mask = ids != font_id
+        if not same_family:
+            mask &= c["family_id"] != c["family_id"][pos]
+        if formats:
+            mask &= np.isin(c["format"], list(formats))
+        if italic is not None:
+            mask &= c["italic"] == italic
+        if weight_min is not None:
+            mask &= c["weight"] >= weight_min
+        if weight_max is not None:
+            mask &= c["weight"] <= weight_max
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return []
+        k = min(k, len(candidates))
+        top = candidates[np.argpartition(distance[candidates], k - 1)[:k]]
+        top = top[np.argsort(distance[top], kind="stable")]
+        return [(int(ids[i]), float(distance[i])) for i in top]
+
+    # -------------------------------
+    # Helpers internes
+    # -------------------------------
+
+    def _rows(self, db: Session, family_ids=None):
+        query = (
+            db.query(
+                Font.id, Font.family_id, Font.format, Font.units_per_em, Font.x_height, Font.cap_height,
+                Font.ascender, Font.descender, Font.weight_class, Font.width_class, Font.italic_angle,
+                Font.panose, Family.panose.label("family_panose"),
+            )
+            .outerjoin(Family, Family.id == Font.family_id)
+            .filter(Font.canonical_id.is_(None), Font.status.is_distinct_from("missing"))
+            .order_by(Font.id)
+        )
+        if family_ids is not None:
+            query = query.filter(Font.family_id.in_(family_ids))
+        return query.all()
+
+    @staticmethod
+    def _columns(rows) -> dict:
+        return {
+            "id": np.array([r.id for r in rows], dtype=np.int64),
+            "family_id": np.array([r.family_id or 0 for r in rows], dtype=np.int64),
+            "format": np.array([r.format for r in rows], dtype=object),
+            "weight": np.array([r.weight_class or 0 for r in rows], dtype=np.int32),
+            "italic": np.array([bool(r.italic_angle) for r in rows], dtype=bool),
+            "features": np.array([font_features(r) for r in rows], dtype=np.float32).reshape(-1, len(FEATURES)),
+            "panose": np.array([font_panose(r) for r in rows], dtype=np.int16).reshape(-1, PANOSE_LENGTH),
+        }
+
+    def _sync(self, db: Session):
+        # Un seul rechargement à la fois ; les requêtes concurrentes attendent la matrice à jour
+        with self._sync_lock:
+            with self._lock:
+                if self._loaded and not self._dirty:
+                    return
+                family_ids = sorted(self._dirty) if self._loaded else None
+                self._dirty.clear()
+                full = not self._loaded
+
+            fresh = self._columns(self._rows(db, family_ids))
+            raw = fresh["features"]
+
+            if full:
+                # Standardisation figée au chargement complet : les mises à jour
+                # partielles restent comparables aux lignes existantes
+                if len(raw):
+                    self._center = np.nan_to_num(np.nanmean(raw, axis=0)).astype(np.float32)
+                    std = np.nan_to_num(np.nanstd(raw, axis=0))
+                    self._scale = np.where(std > 0, std, 1.0).astype(np.float32)
+            # Valeurs inconnues ramenées à la moyenne (0 une fois standardisées)
+            fresh["features"] = np.nan_to_num((raw - self._center) / self._scale, nan=0.0)
+            if full:
+                columns = fresh
+            else:
+                # Remplacement des lignes des familles relues (fonts supprimées ou déplacées comprises)
+                old = self.columns
+                keep = ~np.isin(old["family_id"], family_ids) & ~np.isin(old["id"], fresh["id"])
+                merged = {name: np.concatenate([old[name][keep], fresh[name]]) for name in old}
+                order = np.argsort(merged["id"], kind="stable")
+                columns = {name: values[order] for name, values in merged.items()}
+
+            with self._lock:
+                self.columns = columns
+                self._loaded = True
+
+
+similarity_index = SimilarityIndex()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    family_ids = session.info.pop(PENDING_KEY, None)
+    if family_ids:
+        similarity_index.invalidate(family_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop(PENDING_KEY, None)
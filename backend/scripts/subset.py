@@ -1,13 +1,21 @@
 from fontTools.ttLib import TTFont
 from fontTools import subset as ft_subset
 from fontTools.varLib import instancer
+from hashlib import sha1
 from pathlib import Path
-import re
+import json
+import os
+import tempfile
 
 # Dossier de sortie stable
 SUBSET_FOLDER = (Path(__file__).resolve().parent.parent / "subset").resolve()
 SUBSET_FOLDER.mkdir(parents=True, exist_ok=True)
 
+# Subsets à la demande pour un texte donné (cache disque borné, hors manifeste)
+TEXT_SUBSET_FOLDER = SUBSET_FOLDER / "text"
+TEXT_SUBSET_FOLDER.mkdir(parents=True, exist_ok=True)
+TEXT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
 # Texte de prévisualisation propre (ASCII uniquement)
 PREVIEW_TEXT = (
     "abcdefghijklmnopqrstuvwxyz"
@@ -17,6 +25,14 @@ PREVIEW_TEXT = (
     " The quick brown fox jumps over the lazy dog"
 )
 
+# Options de subset : toute modification change les clés, donc les fichiers
+SUBSET_OPTIONS = {
+    "flavor": "woff2",
+    "with_zopfli": True,
+    "layout_features": ["kern", "liga", "clig", "calt"],
+    "drop_tables": ["STAT", "MVAR", "HVAR", "fvar"],
+}
+
 
 # -------------------------------
 # Helpers internes
@@ -42,63 +58,72 @@ def instantiate_variable_font(font: TTFont) -> TTFont:
     return font
 
 
-def _sanitize_filename(name: str) -> str:
-    """Return a safe filename based on a font name."""
-    # Replace invalid Windows filename chars and collapse whitespace
-    name = re.sub(r"[<>:\\/|?*]", "-", name)
-    name = re.sub(r"\s+", " ", name).strip()
-    # Replace spaces with dashes and collapse repeats
-    name = name.replace(" ", "-")
-    name = re.sub(r"-+", "-", name)
-    return name or "font"
+def options_hash(text: str = PREVIEW_TEXT) -> str:
+    """Hash of everything that changes the subset output besides the source file."""
+    payload = json.dumps({**SUBSET_OPTIONS, "text": text}, sort_keys=True)
+    return sha1(payload.encode("utf-8")).hexdigest()[:16]
 
 
-def get_family_name(font: TTFont) -> str:
-    """Extract the font family name, preferring Typographic Family (ID 16)."""
-    try:
-        name_table = font["name"]
-        family = name_table.getDebugName(16) or name_table.getDebugName(1)
-        if not family:
-            for nid in (21, 2, 6):
-                family = name_table.getDebugName(nid)
-                if family:
-                    break
-        return _sanitize_filename(family) if family else "font"
-    except Exception:
-        return "font"
+def subset_key(source_sha1: str, text: str = PREVIEW_TEXT) -> str:
+    """Clé de contenu d'un subset : sha1 de la source + hash des options."""
+    return sha1(f"{source_sha1}:{options_hash(text)}".encode("ascii")).hexdigest()
+
+
+def subset_path(key: str, folder: Path = SUBSET_FOLDER) -> Path:
+    return folder / f"{key}.woff2"
+
+
+def file_digest(path: Path) -> tuple[int, str]:
+    """(size, sha1) of a generated subset, used for its immutable URL."""
+    data = path.read_bytes()
+    return len(data), sha1(data).hexdigest()
+
+
+def canonical_text(text: str) -> str:
+    """Le jeu de codepoints trié et dédoublonné : même texte, même clé."""
+    return "".join(chr(cp) for cp in sorted({ord(ch) for ch in text}))
+
+
+def prune_text_cache(max_bytes: int = TEXT_CACHE_MAX_BYTES):
+    """Evict the least recently used text subsets once the folder exceeds max_bytes."""
+    entries = []
+    total = 0
+    for p in TEXT_SUBSET_FOLDER.glob("*.woff2"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, p))
+        total += st.st_size
+    for _, size, p in sorted(entries):
+        if total <= max_bytes:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
 
 
 # -------------------------------
 # Fonction principale
 # -------------------------------
 
-def subset(path: Path) -> Path | None:
+def subset(
+    path: Path, key: str | None = None, text: str = PREVIEW_TEXT, folder: Path = SUBSET_FOLDER
+) -> Path | None:
     """
-    Génére un subset woff2 pour la police donnée.
+    Génére un subset woff2 pour la police donnée, stocké sous sa clé de contenu.
     Retourne le chemin du subset, ou None en cas d'erreur.
     """
-    # Build output file name from the font family name
-    _tmp_font = None
-    try:
-        _tmp_font = open_font(path)
-        _family = get_family_name(_tmp_font)
-    except Exception:
-        _family = "font"
-    finally:
-        if _tmp_font:
-            try:
-                _tmp_font.close()
-            except Exception:
-                pass
-    output_path = SUBSET_FOLDER / f"{_family}.woff2"
+    if key is None:
+        try:
+            key = subset_key(sha1(path.read_bytes()).hexdigest(), text)
+        except OSError as e:
+            print(f"[subset error] {path}: {e}")
+            return None
+    output_path = subset_path(key, folder)
 
-    # 1. Cache de fichier: skip si subset déjà à jour
-    try:
-        if output_path.exists() and output_path.stat().st_mtime > path.stat().st_mtime:
-            return output_path
-    except OSError:
-        # Si une erreur d'accès au fichier se produit, on continue le process
-        pass
+    # 1. Contenu adressé par clé : un fichier existant est forcément à jour
+    if output_path.exists():
+        return output_path
 
     font = None
     try:
@@ -110,21 +135,31 @@ def subset(path: Path) -> Path | None:
 
         # 3. Configuration des options de subset
         options = ft_subset.Options()
-        options.flavor = "woff2"
-        options.with_zopfli = True
-        options.text = PREVIEW_TEXT
-        options.layout_features = ["kern", "liga", "clig", "calt"]
+        options.flavor = SUBSET_OPTIONS["flavor"]
+        options.with_zopfli = SUBSET_OPTIONS["with_zopfli"]
+        options.text = text
+        options.layout_features = list(SUBSET_OPTIONS["layout_features"])
         options.ignore_missing_glyphs = True
-        options.drop_tables += ["STAT", "MVAR", "HVAR", "fvar"]
+        options.drop_tables += SUBSET_OPTIONS["drop_tables"]
         options.recalc_timestamp = False
 
         # 4. Exécution
         subsetter = ft_subset.Subsetter(options=options)
-        subsetter.populate(text=PREVIEW_TEXT)
+        subsetter.populate(text=text)
         subsetter.subset(font)
 
-        # 5. Sauvegarde du subset
-        font.save(output_path)
+        # 5. Sauvegarde du subset (écriture atomique : jamais de fichier partiel sous la clé)
+        # Nom temporaire propre à l'appel : queue et endpoints tournent dans les threads d'un même process
+        font.flavor = options.flavor
+        with tempfile.NamedTemporaryFile(dir=output_path.parent, suffix=".tmp", delete=False) as tmp:
+            tmp_path = Path(tmp.name)
+            try:
+                font.save(tmp)
+            except BaseException:
+                tmp.close()
+                tmp_path.unlink(missing_ok=True)
+                raise
+        os.replace(tmp_path, output_path)
         return output_path
 
     except Exception as e:
@@ -141,6 +176,30 @@ def subset(path: Path) -> Path | None:
             except Exception:
                 pass
 
+_text_writes = 0
+
+def text_subset(path: Path, source_sha1: str, text: str) -> Path | None:
+    """Subset containing exactly the codepoints of `text`, cached on disk by (sha1, codepoints)."""
+    global _text_writes
+    text = canonical_text(text)
+    key = subset_key(source_sha1, text)
+    output_path = subset_path(key, TEXT_SUBSET_FOLDER)
+    if output_path.exists():
+        # mtime = dernier accès, pour l'éviction LRU
+        try:
+            os.utime(output_path)
+        except OSError:
+            pass
+        return output_path
+
+    result = subset(path, key, text, TEXT_SUBSET_FOLDER)
+    if result:
+        _text_writes += 1
+        if _text_writes % 100 == 0:
+            prune_text_cache()
+    return result
+
+
 if __name__ == "__main__":
     # Le chemin que vous voulez tester
     test_path = Path(r"C:\Users\fredm\Font\PANGRAM PANGRAM\Casa\PPCasa-Regular.otf")
@@ -0,0 +1,273 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from heapq import heappush, heappop
+from itertools import count
+from pathlib import Path
+import os
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from backend.core.db import SessionLocal
+from backend.crud.subset import get_font_subset, get_subset_by_key, record_subset
+from backend.models.subset import Subset
+from backend.scripts.subset import subset, subset_key, subset_path, options_hash, file_digest
+
+# Tâches terminées gardées pour /fonts/subsets/status (les plus récentes)
+FINISHED_JOBS = 1024
+
+# Attente maximale d'un aperçu demandé par /fonts/{id}/preview avant de répondre 202
+PREVIEW_WAIT = 10.0
+
+
+class SubsetQueue:
+    """File de génération des subsets, traitée par un pool de processus.
+
+    Les tâches sont identifiées par leur clé de contenu : un subset en attente ou
+    en cours n'est jamais encodé deux fois. Une tâche terminée ne bloque pas une
+    nouvelle demande (fichier ou manifeste supprimé depuis) ; seules les
+    FINISHED_JOBS dernières sont gardées pour le suivi. Les tâches sont servies par coût croissant
+    (taille du fichier source) pour que le plus grand nombre d'aperçus soit prêt au
+    plus tôt ; au plus `workers` encodages tournent en même temps.
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.jobs = {}
+        self._finished = OrderedDict()
+        self._heap = []
+        self._seq = count()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._pool = None
+        self._thread = None
+        self._closed = False
+
+    # -------------------------------
+    # API publique
+    # -------------------------------
+
+    def enqueue(self, family_id: int | None, font_id: int, path: Path, key: str) -> dict:
+        try:
+            cost = path.stat().st_size
+        except OSError:
+            cost = 0
+
+        with self._cond:
+            job = self.jobs.get(key)
+            if job and job["status"] in ("pending", "running"):
+                return dict(job)
+
+            self._finished.pop(key, None)
+            seq = next(self._seq)
+            job = {
+                "key": key,
+                "family_id": family_id,
+                "font_id": font_id,
+                "path": str(path),
+                "cost": cost,
+                "status": "pending",
+                "output": None,
+                "error": None,
+                "seq": seq,
+                "updated_at": datetime.now(timezone.utc),
+            }
+            self.jobs[key] = job
+            heappush(self._heap, (cost, seq, key))
+            self._ensure_started()
+            self._cond.notify_all()
+            return dict(job)
+
+    def status(self, family_ids=None) -> list[dict]:
+        with self._cond:
+            if family_ids is None:
+                return [dict(job) for job in self.jobs.values()]
+            wanted = set(family_ids)
+            return [dict(job) for job in self.jobs.values() if job["family_id"] in wanted]
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(1 for job in self.jobs.values() if job["status"] in ("pending", "running"))
+
+    def wait(self, key: str, seq: int, timeout: float | None = None) -> dict | None:
+        """Block until job `seq` of key is no longer pending or running; returns its state."""
+        def settled():
+            job = self.jobs.get(key)
+            return not job or job["seq"] != seq or job["status"] not in ("pending", "running")
+
+        with self._cond:
+            self._cond.wait_for(settled, timeout)
+            job = self.jobs.get(key)
+            return dict(job) if job else None
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Block until every queued job is finished (scripts, tests)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._heap and self._in_flight == 0, timeout)
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # -------------------------------
+    # Helpers internes
+    # -------------------------------
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            self._thread = threading.Thread(target=self._dispatch, name="subset-queue", daemon=True)
+            self._thread.start()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or (self._heap and self._in_flight < self.workers)
+                )
+                if self._closed:
+                    return
+                _, seq, key = heappop(self._heap)
+                job = self.jobs.get(key)
+                # Entrée périmée : la tâche a été ré-enfilée depuis
+                if not job or job["seq"] != seq or job["status"] != "pending":
+                    self._cond.notify_all()
+                    continue
+                job["status"] = "running"
+                job["updated_at"] = datetime.now(timezone.utc)
+                self._in_flight += 1
+
+            try:
+                future = self._pool.submit(subset, Path(job["path"]), key)
+            except RuntimeError as e:
+                self._finish(key, seq, None, str(e))
+                continue
+            future.add_done_callback(
+                lambda f, k=key, s=seq: self._finish(
+                    k, s, None if f.exception() else f.result(), f.exception()
+                )
+            )
+
+    def _finish(self, key: str, seq: int, output, error):
+        if output is not None:
+            try:
+                self._record(key, Path(output))
+            except Exception as e:
+                output, error = None, e
+
+        with self._cond:
+            self._in_flight -= 1
+            job = self.jobs.get(key)
+            if job and job["seq"] == seq:
+                if output is not None:
+                    job["status"] = "done"
+                    job["output"] = str(output)
+                else:
+                    job["status"] = "error"
+                    job["error"] = str(error) if error else "subset failed"
+                job["updated_at"] = datetime.now(timezone.utc)
+                self._forget_finished(key)
+            self._cond.notify_all()
+
+    def _forget_finished(self, key: str):
+        """Keep only the FINISHED_JOBS most recently finished jobs (caller holds _cond)."""
+        self._finished[key] = None
+        self._finished.move_to_end(key)
+        while len(self._finished) > FINISHED_JOBS:
+            old, _ = self._finished.popitem(last=False)
+            del self.jobs[old]
+
+    def _record(self, key: str, output: Path, attempts: int = 5):
+        job = self.jobs[key]
+        size, content_hash = file_digest(output)
+        for attempt in range(attempts):
+            try:
+                with SessionLocal() as db:
+                    record_subset(
+                        db, job["family_id"], job["font_id"], key, size, options_hash(), content_hash
+                    )
+                    db.commit()
+                return
+            except OperationalError:
+                # Base verrouillée par un scan en cours : on retente un peu plus tard
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.5 * (attempt + 1))
+
+
+subset_queue = SubsetQueue()
+
+
+def request_subset(db: Session, family_id: int | None, font_id: int, path: Path, source_sha1: str) -> str:
+    """Return the preview subset key for a font, queueing it only if the manifest lacks it.
+
+    La fraîcheur se résume à une recherche indexée sur la clé : aucun fichier n'est ouvert.
+    """
+    return request_subsets(db, [(family_id, font_id, path, source_sha1)])[0]
+
+
+def request_subsets(db: Session, requests: list[tuple]) -> list[str]:
+    """Batched request_subset over (family_id, font_id, path, sha1) tuples: two manifest queries in all."""
+    keys = [subset_key(sha1) for _, _, _, sha1 in requests]
+    font_ids = [font_id for _, font_id, _, _ in requests]
+    recorded = set(
+        db.query(Subset.font_id, Subset.key).filter(Subset.font_id.in_(font_ids), Subset.key.in_(keys))
+    )
+    existing = {row.key: row for row in db.query(Subset).filter(Subset.key.in_(keys))}
+
+    for (family_id, font_id, path, _), key in zip(requests, keys):
+        if (font_id, key) in recorded:
+            continue
+        row = existing.get(key)
+        if row:
+            # Contenu déjà encodé pour une autre entrée : on réutilise le fichier
+            record_subset(db, family_id, font_id, key, row.size, row.options, row.content_hash)
+        else:
+            subset_queue.enqueue(family_id, font_id, path, key)
+    return keys
+
+
+def ensure_subset(
+    db: Session, family_id: int | None, font_id: int, path: Path, source_sha1: str, timeout: float | None = None
+):
+    """Preview subset of any font, served from the manifest or generated through the subset queue.
+
+    Concurrent requests for the same font share one queued job. Returns (row, job): the
+    manifest row once the subset exists, else None and the job (still pending or running
+    after `timeout`, PREVIEW_WAIT by default, or failed).
+    """
+    key = subset_key(source_sha1)
+    row = _ready_subset(db, family_id, font_id, key)
+    if row:
+        return row, None
+
+    # Pas de connexion gardée pendant l'encodage
+    db.rollback()
+    job = subset_queue.enqueue(family_id, font_id, path, key)
+    settled = subset_queue.wait(key, job["seq"], PREVIEW_WAIT if timeout is None else timeout)
+    if settled and settled["status"] != "done":
+        return None, settled
+    # Terminée (ou déjà sortie du suivi) : le manifeste fait foi
+    row = _ready_subset(db, family_id, font_id, key)
+    return (row, None) if row else (None, job)
+
+
+def _ready_subset(db: Session, family_id: int | None, font_id: int, key: str):
+    """Manifest row of the font for key if its file exists, borrowing another font's encoding."""
+    if not subset_path(key).exists():
+        return None
+    row = get_font_subset(db, font_id, key)
+    if row and row.content_hash:
+        return row
+    existing = get_subset_by_key(db, key)
+    if not existing or not existing.content_hash:
+        return None
+    # Contenu déjà encodé pour une autre entrée : on réutilise le fichier
+    record_subset(db, family_id, font_id, key, existing.size, existing.options, existing.content_hash)
+    db.commit()
+    return get_font_subset(db, font_id, key)
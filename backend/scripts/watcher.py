@@ -0,0 +1,239 @@
+from pathlib import Path
+import threading
+import time
+import traceback
+
+from backend.core.db import SessionLocal
+from backend.models.folder import Folder
+from backend.scripts.scan import scan, is_font_file, iter_font_files
+
+try:  # inotify / FSEvents / ReadDirectoryChangesW selon la plateforme
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    FileSystemEventHandler = object
+    Observer = None
+
+DEBOUNCE_SECONDS = 1.5  # silence requis avant d'ingérer une rafale
+MAX_DELAY_SECONDS = 10.0  # une rafale continue est tout de même ingérée au bout de ce délai
+POLL_INTERVAL = 5.0
+_PENDING = object()  # watch en cours de création, hors verrou
+
+
+class _Handler(FileSystemEventHandler):
+    def __init__(self, watcher: "FolderWatcher", root: Path):
+        self.watcher = watcher
+        self.root = root
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        if event.is_directory and event.event_type == "modified":
+            # Contenu d'un dossier modifié : ses fichiers ont leurs propres événements
+            return
+        if event.event_type == "moved":
+            self.watcher.notify(self.root, Path(event.src_path))
+            self.watcher.notify(self.root, Path(event.dest_path))
+        else:
+            self.watcher.notify(self.root, Path(event.src_path))
+
+
+class _Poller:
+    """Repli sans watchdog : compare deux instantanés (taille, mtime) du dossier.
+
+    Le premier instantané est pris sur le thread du poller : un gros dossier ne
+    bloque ni le démarrage de l'app ni POST /folders.
+    """
+
+    def __init__(self, watcher: "FolderWatcher", root: Path):
+        self.watcher = watcher
+        self.root = root
+        self._stop = threading.Event()
+        self._snapshot = None
+        self._thread = threading.Thread(target=self._run, name=f"poll:{root}", daemon=True)
+        self._thread.start()
+
+    def _take(self) -> dict:
+        snapshot = {}
+        for path in iter_font_files(self.root):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def _run(self):
+        self._snapshot = self._take()
+        while not self._stop.wait(POLL_INTERVAL):
+            current = self._take()
+            for path in current.keys() | self._snapshot.keys():
+                if current.get(path) != self._snapshot.get(path):
+                    self.watcher.notify(self.root, path)
+            self._snapshot = current
+
+    def stop(self):
+        self._stop.set()
+
+
+class FolderWatcher:
+    """Surveille les dossiers `is_watching` et ingère les fichiers modifiés par lots.
+
+    Les événements sont accumulés par chemin ; un lot part quand le dossier est resté
+    silencieux DEBOUNCE_SECONDS (décompression d'une archive, copie d'un pack...).
+    L'état du disque au moment du lot décide : un chemin présent est (ré)ingéré,
+    un chemin absent est retiré du catalogue.
+    """
+
+    def __init__(self):
+        self._watches = {}
+        self._observer = None
+        self._pending = {}  # root -> set(paths)
+        self._first_event = None
+        self._last_event = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    # -------------------------------
+    # API publique
+    # -------------------------------
+
+    def start(self):
+        """Watch every folder flagged is_watching."""
+        with SessionLocal() as db:
+            roots = [path for (path,) in db.query(Folder.path).filter(Folder.is_watching.is_(True))]
+        for root in roots:
+            self.watch(Path(root))
+
+    def watch(self, root: Path):
+        root = root.resolve()
+        if not root.is_dir():
+            return
+        with self._cond:
+            if root in self._watches or self._closed:
+                return
+            self._watches[root] = _PENDING
+            if Observer is not None and self._observer is None:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            observer = self._observer
+
+        # Création hors verrou : schedule() ou le poller peuvent parcourir l'arborescence
+        try:
+            if observer is not None:
+                watch = observer.schedule(_Handler(self, root), str(root), recursive=True)
+            else:
+                watch = _Poller(self, root)
+        except Exception:
+            with self._cond:
+                if self._watches.get(root) is _PENDING:
+                    del self._watches[root]
+            raise
+
+        with self._cond:
+            if self._watches.get(root) is _PENDING and not self._closed:
+                self._watches[root] = watch
+                self._ensure_started()
+                return
+        # unwatch() ou shutdown() est passé entre-temps
+        self._stop_watch(watch)
+
+    def unwatch(self, root: Path):
+        root = root.resolve()
+        with self._cond:
+            watch = self._watches.pop(root, None)
+            self._pending.pop(root, None)
+        if watch is not None and watch is not _PENDING:
+            self._stop_watch(watch)
+
+    def watched(self) -> list[str]:
+        with self._cond:
+            return [str(root) for root, watch in self._watches.items() if watch is not _PENDING]
+
+    def notify(self, root: Path, path: Path):
+        now = time.monotonic()
+        with self._cond:
+            self._pending.setdefault(root, set()).add(path)
+            self._first_event = self._first_event or now
+            self._last_event = now
+            self._cond.notify_all()
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            watches = list(self._watches.values())
+            self._watches.clear()
+        for watch in watches:
+            if isinstance(watch, _Poller):
+                watch.stop()
+        if self._observer is not None:
+            self._observer.stop()
+
+    def _stop_watch(self, watch):
+        if isinstance(watch, _Poller):
+            watch.stop()
+        elif self._observer is not None:
+            self._observer.unschedule(watch)
+
+    # -------------------------------
+    # Helpers internes
+    # -------------------------------
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+            self._thread.start()
+
+    def _due(self) -> float | None:
+        """Seconds left before the pending batch is due (<= 0: now), None if nothing is pending."""
+        if not self._pending:
+            return None
+        now = time.monotonic()
+        return min(
+            self._last_event + DEBOUNCE_SECONDS - now,
+            self._first_event + MAX_DELAY_SECONDS - now,
+        )
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    due = self._due()
+                    if due is not None and due <= 0:
+                        break
+                    self._cond.wait(due)
+                if self._closed:
+                    return
+                batch, self._pending = self._pending, {}
+                self._first_event = self._last_event = None
+
+            for root, paths in batch.items():
+                try:
+                    self._ingest(root, paths)
+                except Exception:
+                    traceback.print_exc()
+
+    def _ingest(self, root: Path, paths: set[Path]):
+        changed, removed = set(), set()
+        for path in paths:
+            if path.is_dir():
+                # Dossier créé ou déplacé dans l'arborescence : ses fichiers n'ont pas d'événement propre
+                changed.update(iter_font_files(path))
+            elif path.is_file():
+                if is_font_file(path):
+                    changed.add(path)
+            else:
+                # Fichier ou dossier disparu (un dossier retire toutes les fonts sous lui)
+                removed.add(path)
+        if not changed and not removed:
+            return
+
+        print(f"[watch] {root}: {len(changed)} changed, {len(removed)} removed")
+        with SessionLocal() as db:
+            scan(db, root, paths=sorted(changed), removed=sorted(removed))
+
+
+folder_watcher = FolderWatcher()
@@ -1,4 +1,4 @@
-import { createSignal, createMemo, onCleanup, onMount, For } from "solid-js";
+import { createSignal, createMemo, createEffect, onCleanup, onMount, For } from "solid-js";
 
 export default function List(props) {
     const [itemHeight, setItemHeight] = createSignal(100)
@@ -16,6 +16,11 @@ export default function List(props) {
     const visibleItems = createMemo(() => props.items.slice(startIndex(), endIndex()));
     const totalHeight = createMemo(() => props.items.length * itemHeight() + (padding * 2));
 
+    // Page suivante dès que la fenêtre visible approche de la fin des items chargés
+    createEffect(() => {
+        if (props.onEndReached && endIndex() >= props.items.length - buffer) props.onEndReached();
+    });
+
     onMount(() => {
         const resizeOBS = new ResizeObserver(([entry]) => {
             setContainerHeight(entry.contentRect.height);
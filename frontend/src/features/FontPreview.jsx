@@ -24,9 +24,20 @@ async function loadFont(url, name) {
   loadedFonts.add(name);
 }
 
-async function fetchRepresentatives() {
-  const res = await fetch("/fonts/representative", { cache: "no-store" });
+const PAGE_SIZE = 200;
+
+async function fetchRepresentatives(after) {
+  const params = new URLSearchParams({ limit: PAGE_SIZE });
+  if (after) params.set("after", after);
+  const res = await fetch(`/fonts/representative?${params}`, { cache: "no-store" });
   if (!res.ok) throw new Error("failed to load representatives");
+  return { items: await res.json(), next: res.headers.get("X-Next-Cursor") };
+}
+
+async function fetchSearch(term) {
+  const params = new URLSearchParams({ q: term, limit: PAGE_SIZE });
+  const res = await fetch(`/fonts/search?${params}`);
+  if (!res.ok) throw new Error("failed to search fonts");
   return res.json();
 }
 
@@ -42,27 +53,41 @@ export default function FontPreview() {
   const [family, setFamily] = createSignal(null)
   const [text, setText] = createSignal("The fox jump over the lazy dog")
   const [familyData] = createResource(family, fetchFamily)
-  const [representatives] = createResource(fetchRepresentatives);
+  const [representatives, { mutate }] = createResource(() => fetchRepresentatives());
   let time
+  let loadingMore = false
+
+  async function loadMore() {
+    const current = representatives();
+    if (!current?.next || loadingMore) return;
+    loadingMore = true;
+    try {
+      const page = await fetchRepresentatives(current.next);
+      mutate({ items: [...current.items, ...page.items], next: page.next });
+    } finally {
+      loadingMore = false;
+    }
+  }
 
   function handleQuery(value) {
     if (time) clearTimeout(time)
     time = setTimeout(() => setSearch(value), 300);
   }
 
+  // Recherche côté serveur (FTS5) : seules les correspondances sont téléchargées
+  const [searchResults] = createResource(() => search().trim(), fetchSearch);
+
   const filteredFonts = createMemo(() => {
-    const data = representatives() ?? [];
-    console.log(data)
-    const term = search().trim().toLowerCase();
-    if (!term) return data;
-    return data.filter((font) => font.name.toLowerCase().includes(term));
+    if (!search().trim()) return representatives()?.items ?? [];
+    return searchResults.latest ?? [];
   });
 
 
   function FontItem(props) {
     onMount(() => {
       const name = props.item.name
-      const url = `url(/api/fonts/${name.replaceAll(" ", "-")}.woff2)`
+      if (!props.item.subset_url) return
+      const url = `url(${props.item.subset_url})`
       const timer = setTimeout(() => void loadFont(url, name), 50)
       onCleanup(() => clearTimeout(timer))
     })
@@ -98,12 +123,9 @@ export default function FontPreview() {
       const fonts = familyData();
       if (!fonts?.length) return;
 
-      (async () => {
-        for (const font of fonts) {
-          const url = `url(/font?path=${encodeURIComponent(font.path)})`
-          await loadFont(url, font.full_name);
-        }
-      })();
+      await Promise.allSettled(
+        fonts.map((font) => loadFont(`url(${font.subset_url})`, font.full_name))
+      );
     })
 
     return (
@@ -135,9 +157,14 @@ export default function FontPreview() {
     <section id="font-viewer">
       <Show when={!representatives.error} fallback={<ErrorPreview />}>
         <Show when={!representatives.loading} fallback={<LoadingPreview />}>
-          <Show when={representatives().length !== 0} fallback={<EmptyPreview />}>
+          <Show when={representatives().items.length !== 0} fallback={<EmptyPreview />}>
             <Show when={filteredFonts().length !== 0} fallback={<EmptySearch />}>
-              <List items={filteredFonts()} buffer={6} padding={48}>
+              <List
+                items={filteredFonts()}
+                buffer={6}
+                padding={48}
+                onEndReached={search().trim() ? undefined : loadMore}
+              >
                 {(item, index) => <FontItem item={item} index={index} />}
               </List>
             </Show>
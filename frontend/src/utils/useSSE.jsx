@@ -0,0 +1,71 @@
+import { createEffect, createSignal, onCleanup } from "solid-js";
+
+// Abonnement Server-Sent Events. `url` est un accessor : un changement d'url
+// ferme le flux courant et en ouvre un nouveau, une url vide n'ouvre rien.
+// Le serveur termine le flux par un événement "end" (job fini).
+export function useSSE(url, { event = "progress" } = {}) {
+  const [data, setData] = createSignal(null);
+  const [status, setStatus] = createSignal("idle"); // idle | open | closed | error
+  let source = null;
+
+  const close = () => {
+    if (source) {
+      source.close();
+      source = null;
+    }
+  };
+
+  createEffect(() => {
+    const target = url();
+    close();
+    if (!target) {
+      setStatus("idle");
+      return;
+    }
+
+    const es = new EventSource(target);
+    source = es;
+    es.onopen = () => setStatus("open");
+    es.addEventListener(event, (e) => {
+      try {
+        setData(JSON.parse(e.data));
+      } catch (err) {
+        console.error(err);
+      }
+    });
+    es.addEventListener("end", () => {
+      // Sans fermeture explicite, EventSource se reconnecte tout seul
+      es.close();
+      setStatus("closed");
+    });
+    es.onerror = () => {
+      if (es.readyState === EventSource.CLOSED) setStatus("error");
+    };
+  });
+
+  onCleanup(close);
+
+  return { data, status, close };
+}
+
+// Lance un scan et suit sa progression ; cancel() annule le job côté serveur.
+export function useScanJob() {
+  const [job, setJob] = createSignal(null);
+  const { data, status } = useSSE(() => job() && `/scan/jobs/${job().id}/events`);
+
+  const start = async (path, workers = 1) => {
+    const params = new URLSearchParams({ path, workers });
+    const res = await fetch(`/scan/jobs?${params}`, { method: "POST" });
+    if (!res.ok) throw new Error("failed to start scan");
+    const created = await res.json();
+    setJob(created);
+    return created;
+  };
+
+  const cancel = async () => {
+    if (!job()) return;
+    await fetch(`/scan/jobs/${encodeURIComponent(job().id)}`, { method: "DELETE" });
+  };
+
+  return { progress: () => data() ?? job(), status, start, cancel };
+}
@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# DB_PATH et l'index sha1 sont relatifs au répertoire courant : les tests tournent
+# dans un dossier jetable, fixé avant le premier import du backend
+WORKDIR = Path(tempfile.mkdtemp(prefix="specimen-tests-"))
+os.chdir(WORKDIR)
+
+from fontTools.fontBuilder import FontBuilder  # noqa: E402
+from fontTools.pens.ttGlyphPen import TTGlyphPen  # noqa: E402
+
+from backend.core.db import DB_PATH, Base, SessionLocal, engine, migrate, read_engine  # noqa: E402
+import backend.models.facet  # noqa: E402,F401
+import backend.models.file_index  # noqa: E402,F401
+import backend.models.folder  # noqa: E402,F401
+import backend.models.font  # noqa: E402,F401
+import backend.models.subset  # noqa: E402,F401
+from backend.crud.search import ensure_search_index  # noqa: E402
+from backend.scripts import sha_index  # noqa: E402
+from backend.scripts.similar import similarity_index  # noqa: E402
+from backend.scripts.subset_queue import subset_queue  # noqa: E402
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Fresh schema for each test, with background subset generation disabled."""
+    sha_index.close_shared()
+    engine.dispose()
+    read_engine.dispose()
+    for path in (DB_PATH, f"{DB_PATH}-wal", f"{DB_PATH}-shm", sha_index.SHA1_INDEX_PATH):
+        Path(path).unlink(missing_ok=True)
+    Base.metadata.create_all(bind=engine)
+    migrate(engine)
+    similarity_index.invalidate()
+
+    queued = []
+    monkeypatch.setattr(subset_queue, "enqueue", lambda *args, **kwargs: queued.append(args) or {})
+
+    with SessionLocal() as session:
+        ensure_search_index(session)
+        session.info["queued_subsets"] = queued
+        yield session
+    sha_index.close_shared()
+
+
+def build_font(path: Path, family: str, style: str = "Regular", weight: int = 400, advance: int = 500) -> Path:
+    """Write a minimal TrueType font; `advance` changes the content without changing the names."""
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder([".notdef", "A"])
+    fb.setupCharacterMap({ord("A"): "A"})
+    pen = TTGlyphPen(None)
+    pen.moveTo((50, 0))
+    pen.lineTo((50, 700))
+    pen.lineTo((advance - 50, 700))
+    pen.lineTo((advance - 50, 0))
+    pen.closePath()
+    glyph = pen.glyph()
+    fb.setupGlyf({".notdef": glyph, "A": glyph})
+    fb.setupHorizontalMetrics({".notdef": (advance, 50), "A": (advance, 50)})
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable({"familyName": family, "styleName": style})
+    fb.setupOS2(usWeightClass=weight, sTypoAscender=800, sTypoDescender=-200, sxHeight=500, sCapHeight=700)
+    fb.setupPost()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fb.save(str(path))
+    return path
+
+
+@pytest.fixture
+def make_font():
+    return build_font
@@ -0,0 +1,40 @@
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+from backend.scripts import group
+from backend.scripts.group import FamilyIndex
+
+
+def random_keys(rng, count, alphabet="abcab ", max_length=16):
+    # Petit alphabet : beaucoup de paires proches du seuil, bigrammes répétés
+    return sorted({
+        "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length)))
+        for _ in range(count)
+    })
+
+
+@pytest.mark.parametrize("threshold", [0.6, 0.75, 0.8, 0.9])
+def test_candidates_never_miss_a_match(monkeypatch, threshold):
+    monkeypatch.setattr(group, "MATCHING_THRESHOLD", threshold)
+    rng = random.Random(threshold)
+    keys = random_keys(rng, 400)
+    index = FamilyIndex((key, {}) for key in keys)
+
+    for query in keys[:150] + random_keys(rng, 100, alphabet="abc", max_length=12):
+        found = set(index.candidates(query))
+        matches = {key for key in keys if SequenceMatcher(None, query, key).ratio() >= threshold}
+        assert matches <= found, query
+
+
+def test_candidates_follow_insertion_order_and_deletions():
+    index = FamilyIndex()
+    for key in ["helveticaneue", "helvetica", "helveticanue", "futura"]:
+        index[key] = {}
+    assert index.candidates("helveticaneu") == ["helveticaneue", "helvetica", "helveticanue"]
+
+    del index["helveticaneue"]
+    assert index.pop("futura") == {}
+    assert index.candidates("helveticaneu") == ["helvetica", "helveticanue"]
+    assert index.candidates("futura") == []
@@ -0,0 +1,95 @@
+from email.utils import formatdate
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from backend.core.http import async_cached_file_response, cached_file_response
+
+DATA = bytes(range(100))
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    path = tmp_path / "font.bin"
+    path.write_bytes(DATA)
+    return path
+
+
+@pytest.fixture(params=["sync", "async"])
+def client(request, file_path):
+    app = FastAPI()
+
+    @app.get("/sync")
+    def sync_file(request: Request):
+        return cached_file_response(request, file_path, "abc", "font/ttf")
+
+    @app.get("/async")
+    async def async_file(request: Request):
+        return await async_cached_file_response(request, file_path, "abc", "font/ttf")
+
+    test_client = TestClient(app)
+    test_client.base_url = test_client.base_url.join(f"/{request.param}")
+    return test_client
+
+
+def get(client, **headers):
+    return client.get("", headers={name.replace("_", "-"): value for name, value in headers.items()})
+
+
+def test_full_response_carries_validators(client, file_path):
+    response = get(client)
+    assert response.status_code == 200 and response.content == DATA
+    assert response.headers["etag"] == '"abc"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["last-modified"] == formatdate(file_path.stat().st_mtime, usegmt=True)
+
+
+@pytest.mark.parametrize("value", ['"abc"', 'W/"abc"', '"other", "abc"', "*"])
+def test_matching_etag_is_not_modified(client, value):
+    response = get(client, if_none_match=value)
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == '"abc"'
+
+
+def test_if_none_match_takes_precedence_over_date(client, file_path):
+    later = formatdate(file_path.stat().st_mtime + 60, usegmt=True)
+    assert get(client, if_modified_since=later).status_code == 304
+    assert get(client, if_none_match='"other"', if_modified_since=later).status_code == 200
+    earlier = formatdate(file_path.stat().st_mtime - 60, usegmt=True)
+    assert get(client, if_modified_since=earlier).status_code == 200
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=90-", 90, 99),
+    ("bytes=-5", 95, 99),
+    ("bytes=95-500", 95, 99),
+])
+def test_single_range(client, header, start, end):
+    response = get(client, range=header)
+    assert response.status_code == 206
+    assert response.content == DATA[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/100"
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=20-10", "bytes=-0"])
+def test_unsatisfiable_range(client, header):
+    response = get(client, range=header)
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */100"
+
+
+@pytest.mark.parametrize("headers", [
+    {"range": "bytes=0-1,5-6"},  # plusieurs plages : fichier complet
+    {"range": "items=0-1"},
+    {"range": "bytes=0-9", "if_range": '"stale"'},
+])
+def test_range_falls_back_to_full_file(client, headers):
+    response = get(client, **headers)
+    assert response.status_code == 200 and response.content == DATA
+
+
+def test_if_range_matching_etag_serves_the_range(client):
+    response = get(client, range="bytes=0-9", if_range='"abc"')
+    assert response.status_code == 206 and response.content == DATA[:10]
@@ -0,0 +1,103 @@
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+from backend.crud.family import refresh_family_stats
+from backend.models.facet import FontFacet
+from backend.models.font import Family, Font
+from backend.scripts import regroup as regroup_module
+from backend.scripts.group import MATCHING_THRESHOLD
+from backend.scripts.regroup import regroup
+from backend.scripts.scan import ingest_lock
+
+
+def add_family(db, name, fonts):
+    family = Family(name=name, name_normalized=name.lower().replace(" ", ""))
+    db.add(family)
+    db.flush()
+    for style, weight in fonts:
+        db.add(Font(
+            path=f"/fonts/{name}-{style}.ttf", sha1=f"{name}{style}".encode().hex()[:40].ljust(40, "0"),
+            family_id=family.id, family_name=name, full_name=f"{name} {style}", style_name=style,
+            weight_class=weight, format="ttf",
+        ))
+    db.flush()
+    return family
+
+
+def test_merging_two_families_moves_their_facets(db):
+    # Deux familles dont les noms se normalisent pareil : regroup doit les fusionner
+    keep = add_family(db, "Acme Sans", [("Regular", 400), ("Bold", 700)])
+    merged = add_family(db, "AcmeSans", [("Light", 300)])
+    other = add_family(db, "Zeta Serif", [("Regular", 400)])
+    refresh_family_stats(db)
+    db.commit()
+    keep_id, merged_id, other_id = keep.id, merged.id, other.id
+
+    stats = regroup(db)
+
+    assert stats["moved_fonts"] == 1
+    assert stats["removed_families"] == 1
+    assert db.get(Family, merged_id) is None
+    assert {f.family_id for f in db.query(Font)} == {keep_id, other_id}
+
+    # Une ligne de facettes par font, rattachée à sa famille actuelle
+    facets = dict(db.query(FontFacet.font_id, FontFacet.family_id))
+    assert facets == {f.id: f.family_id for f in db.query(Font)}
+    assert db.get(Family, keep_id).font_count == 3
+
+
+def test_dry_run_changes_nothing(db):
+    add_family(db, "Acme Sans", [("Regular", 400)])
+    add_family(db, "AcmeSans", [("Light", 300)])
+    db.commit()
+
+    stats = regroup(db, dry_run=True)
+
+    assert stats["removed_families"] == 1
+    assert db.query(Family).count() == 2
+
+
+def test_failure_rolls_back_the_whole_regroup(db, monkeypatch):
+    add_family(db, "Acme Sans", [("Regular", 400), ("Bold", 700)])
+    add_family(db, "AcmeSans", [("Light", 300)])
+    db.commit()
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("facets")
+
+    monkeypatch.setattr(regroup_module, "refresh_facets", broken)
+    with pytest.raises(RuntimeError):
+        regroup(db)
+
+    assert db.query(Family).count() == 2
+    assert len({f.family_id for f in db.query(Font)}) == 2
+
+
+def test_regroup_holds_the_ingest_lock(db, monkeypatch):
+    seen = []
+    load_fonts = regroup_module.load_fonts
+    monkeypatch.setattr(regroup_module, "load_fonts", lambda session: seen.append(ingest_lock.locked()) or load_fonts(session))
+
+    regroup(db)
+
+    assert seen == [True]
+    assert not ingest_lock.locked()
+
+
+def test_cluster_matches_a_brute_force_fuzzy_match():
+    rng = random.Random(6)
+    names = sorted({"".join(rng.choice("abcd") for _ in range(rng.randint(1, 9))) for _ in range(300)})
+    fonts = [{"id": i, "family_id": None, "name_normalized": name, "panose": None} for i, name in enumerate(names)]
+
+    # Référence : toutes les paires comparées par SequenceMatcher.ratio()
+    uf = regroup_module.UnionFind(len(names))
+    for i, name in enumerate(names):
+        for j in range(i):
+            if SequenceMatcher(None, name, names[j]).ratio() >= MATCHING_THRESHOLD:
+                uf.union(i, j)
+    expected = sorted(sorted(i for i in range(len(names)) if uf.find(i) == root) for root in set(map(uf.find, range(len(names)))))
+
+    clusters = sorted(sorted(f["id"] for f in members) for members in regroup_module.cluster(fonts))
+    assert clusters == expected
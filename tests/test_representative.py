@@ -0,0 +1,42 @@
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.models.font import Family, Font
+
+client = TestClient(app)
+
+
+def test_keyset_pages_include_unnamed_families(db):
+    for name in (None, "Beta", None, "", "Alpha", "Gamma"):
+        db.add(Family(name=name, font_count=1))
+    db.add(Family(name="Empty", font_count=0))
+    db.commit()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1} | ({"after": cursor} if cursor is not None else {})
+        response = client.get("/fonts/representative", params=params)
+        assert response.status_code == 200
+        seen += [(family["name"], family["id"]) for family in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == [(None, 1), (None, 3), ("", 4), ("Alpha", 5), ("Beta", 2), ("Gamma", 6)]
+
+
+def test_family_without_manifest_falls_back_to_preview(db):
+    legacy = Family(name="Legacy", font_count=1)
+    ready = Family(name="Ready", font_count=1, subset_hash="abc123")
+    bare = Family(name="Bare", font_count=1)
+    db.add_all([legacy, ready, bare])
+    db.flush()
+    font = Font(path="/fonts/legacy.ttf", sha1="0" * 40, family_id=legacy.id)
+    db.add(font)
+    db.flush()
+    legacy.representative_id = font.id
+    db.commit()
+
+    urls = {family["name"]: family["subset_url"] for family in client.get("/fonts/representative").json()}
+
+    assert urls == {"Bare": None, "Legacy": f"/fonts/{font.id}/preview", "Ready": "/api/subsets/abc123.woff2"}
@@ -0,0 +1,227 @@
+import os
+
+from fontTools.ttLib import TTFont
+
+from backend.crud.search import search_family_ids
+from backend.models.facet import FontFacet
+from backend.models.font import Family, Font
+from backend.scripts import scan as scan_module
+from backend.scripts.scan import FileIndexCache, scan
+from backend.scripts.similar import similarity_index
+
+
+def fonts_by_path(db):
+    db.expire_all()
+    return {f.path: f for f in db.query(Font)}
+
+
+def test_rescan_skips_unchanged_files(db, make_font, tmp_path):
+    make_font(tmp_path / "lib/Acme-Regular.ttf", "Acme")
+    make_font(tmp_path / "lib/Acme-Bold.ttf", "Acme", "Bold", 700)
+
+    first = scan(db, tmp_path / "lib")
+    assert (first["extracted"], first["added"]) == (2, 2)
+    assert db.query(Family).count() == 1
+
+    again = scan(db, tmp_path / "lib")
+    assert (again["skipped"], again["extracted"], again["added"]) == (2, 0, 0)
+
+
+def test_move_updates_path_without_extraction(db, make_font, tmp_path):
+    src = make_font(tmp_path / "lib/Acme-Regular.ttf", "Acme")
+    scan(db, tmp_path / "lib")
+    font_id = db.query(Font.id).scalar()
+
+    dst = tmp_path / "lib/sorted/acme.ttf"
+    dst.parent.mkdir()
+    os.rename(src, dst)
+    counters = scan(db, tmp_path / "lib")
+
+    assert (counters["extracted"], counters["moved"], counters["missing"]) == (0, 1, 0)
+    fonts = fonts_by_path(db)
+    assert list(fonts) == [str(dst)]
+    assert fonts[str(dst)].id == font_id and fonts[str(dst)].status == "ok"
+
+
+def test_incremental_scan_loads_only_its_paths(db, make_font, tmp_path, monkeypatch):
+    src = make_font(tmp_path / "lib/Acme-Regular.ttf", "Acme")
+    other = make_font(tmp_path / "lib/Other-Regular.ttf", "Other")
+    scan(db, tmp_path / "lib")
+    font_id = db.query(Font.id).filter(Font.path == str(src)).scalar()
+
+    loaded = []
+
+    def file_index(*args):
+        cache = FileIndexCache(*args)
+        loaded.append(set(cache.entries))
+        return cache
+
+    monkeypatch.setattr(scan_module, "FileIndexCache", file_index)
+    dst = tmp_path / "lib/sorted/acme.ttf"
+    dst.parent.mkdir()
+    os.rename(src, dst)
+    counters = scan(db, tmp_path / "lib", paths=[dst, other], removed=[src])
+
+    # Entrées des seuls chemins demandés ; le déplacement est retrouvé par signature en base
+    assert loaded == [{str(other)}]
+    assert (counters["extracted"], counters["moved"], counters["skipped"]) == (0, 1, 2)
+    fonts = fonts_by_path(db)
+    assert set(fonts) == {str(dst), str(other)}
+    assert fonts[str(dst)].id == font_id and fonts[str(dst)].status == "ok"
+
+
+def test_swapped_names_follow_their_fonts(db, make_font, tmp_path):
+    a = make_font(tmp_path / "lib/a.ttf", "Acme")
+    b = make_font(tmp_path / "lib/b.ttf", "Acme", "Bold", 700)
+    scan(db, tmp_path / "lib")
+    before = {f.style_name: f.id for f in db.query(Font)}
+
+    os.rename(a, tmp_path / "lib/tmp.ttf")
+    os.rename(b, a)
+    os.rename(tmp_path / "lib/tmp.ttf", b)
+    counters = scan(db, tmp_path / "lib")
+
+    assert (counters["extracted"], counters["moved"]) == (0, 2)
+    fonts = fonts_by_path(db)
+    assert fonts[str(a)].style_name == "Bold" and fonts[str(a)].id == before["Bold"]
+    assert fonts[str(b)].style_name == "Regular" and fonts[str(b)].id == before["Regular"]
+
+
+def test_deleted_file_is_tombstoned_then_restored(db, make_font, tmp_path):
+    path = make_font(tmp_path / "lib/Acme-Regular.ttf", "Acme")
+    make_font(tmp_path / "lib/Acme-Bold.ttf", "Acme", "Bold", 700)
+    scan(db, tmp_path / "lib")
+    data = path.read_bytes()
+
+    path.unlink()
+    counters = scan(db, tmp_path / "lib")
+    assert counters["missing"] == 1
+    assert fonts_by_path(db)[str(path)].status == "missing"
+
+    path.write_bytes(data)
+    scan(db, tmp_path / "lib")
+    assert fonts_by_path(db)[str(path)].status == "ok"
+
+
+def test_scan_does_not_reconcile_look_alike_folders(db, make_font, tmp_path):
+    # _ est un joker LIKE et LIKE ignore la casse : aucun des deux ne doit déborder
+    for folder, family in (("my_set", "Alpha"), ("myXset", "Beta"), ("MY_SET2", "Gamma"), ("my_set2", "Delta")):
+        make_font(tmp_path / "lib" / folder / "font.ttf", family)
+    scan(db, tmp_path / "lib")
+
+    (tmp_path / "lib/my_set/font.ttf").unlink()
+    counters = scan(db, tmp_path / "lib/my_set")
+
+    assert counters["missing"] == 1
+    status = {path: f.status for path, f in fonts_by_path(db).items()}
+    assert status == {
+        str(tmp_path / "lib/my_set/font.ttf"): "missing",
+        str(tmp_path / "lib/myXset/font.ttf"): "ok",
+        str(tmp_path / "lib/MY_SET2/font.ttf"): "ok",
+        str(tmp_path / "lib/my_set2/font.ttf"): "ok",
+    }
+
+
+def test_same_face_in_another_container_is_linked(db, make_font, tmp_path):
+    ttf = make_font(tmp_path / "lib/Acme-Regular.ttf", "Acme")
+    font = TTFont(ttf)
+    font.flavor = "woff"
+    (tmp_path / "lib/web").mkdir()
+    font.save(tmp_path / "lib/web/Acme-Regular.woff")
+
+    counters = scan(db, tmp_path / "lib")
+
+    assert (counters["added"], counters["duplicates"]) == (1, 1)
+    fonts = fonts_by_path(db)
+    canonical = fonts[str(ttf)]
+    duplicate = fonts[str(tmp_path / "lib/web/Acme-Regular.woff")]
+    assert duplicate.canonical_id == canonical.id
+    assert duplicate.family_id == canonical.family_id
+    family = db.get(Family, canonical.family_id)
+    assert family.font_count == 1 and family.formats == "ttf,woff"
+
+
+def test_missing_fonts_leave_family_stats_and_search(db, make_font, tmp_path):
+    ttf = make_font(tmp_path / "lib/acme/Acme-Regular.ttf", "Acme")
+    font = TTFont(ttf)
+    font.flavor = "woff"
+    font.save(tmp_path / "lib/acme/Acme-Regular.woff")
+    other = make_font(tmp_path / "lib/Zeta-Regular.ttf", "Zeta")
+    scan(db, tmp_path / "lib")
+    acme = db.query(Family).filter(Family.name == "Acme").one()
+    acme_id = acme.id
+    assert (acme.font_count, acme.formats) == (1, "ttf,woff")
+    assert search_family_ids(db, "acme", 10, 0) == [acme_id]
+
+    data = {path: path.read_bytes() for path in (tmp_path / "lib/acme").iterdir()}
+    for path in data:
+        path.unlink()
+    counters = scan(db, tmp_path / "lib")
+
+    assert counters["missing"] == 2
+    db.expire_all()
+    acme = db.get(Family, acme_id)
+    assert (acme.font_count, acme.formats, acme.representative_id) == (0, "", None)
+    assert search_family_ids(db, "acme", 10, 0) == []
+    other_family = db.query(Font.family_id).filter(Font.path == str(other)).scalar()
+    assert {family_id for (family_id,) in db.query(FontFacet.family_id)} == {other_family}
+    ttf_id = db.query(Font.id).filter(Font.path == str(ttf)).scalar()
+    assert similarity_index.similar(db, ttf_id) is None
+
+    for path, content in data.items():
+        path.write_bytes(content)
+    scan(db, tmp_path / "lib")
+    db.expire_all()
+    acme = db.get(Family, acme_id)
+    assert (acme.font_count, acme.formats, acme.representative_id) == (1, "ttf,woff", ttf_id)
+    assert search_family_ids(db, "acme", 10, 0) == [acme_id]
+
+
+def test_font_cataloged_without_fingerprint_gets_one(db, make_font, tmp_path):
+    ttf = make_font(tmp_path / "lib/Acme-Regular.ttf", "Acme")
+    make_font(tmp_path / "lib/Acme-Bold.ttf", "Acme", "Bold", 700)
+    scan(db, tmp_path / "lib")
+    # Ligne d'avant les empreintes
+    db.query(Font).update({"fingerprint": None})
+    db.commit()
+
+    font = TTFont(ttf)
+    font.flavor = "woff"
+    (tmp_path / "lib/web").mkdir()
+    font.save(tmp_path / "lib/web/Acme-Regular.woff")
+    counters = scan(db, tmp_path / "lib")
+
+    assert (counters["extracted"], counters["added"], counters["duplicates"]) == (3, 0, 1)
+    fonts = fonts_by_path(db)
+    canonical = fonts[str(ttf)]
+    assert canonical.fingerprint and canonical.canonical_id is None
+    assert fonts[str(tmp_path / "lib/web/Acme-Regular.woff")].canonical_id == canonical.id
+    assert all(f.fingerprint for f in fonts.values())
+    family = db.get(Family, canonical.family_id)
+    assert family.font_count == 2 and family.formats == "ttf,woff"
+
+    again = scan(db, tmp_path / "lib")
+    assert (again["extracted"], again["skipped"]) == (0, 3)
+
+
+def test_woff_cataloged_first_joins_the_backfilled_face(db, make_font, tmp_path):
+    # La copie woff est déjà une face à part ; la ttf sans empreinte devient son doublon
+    ttf = make_font(tmp_path / "lib/b/Acme-Regular.ttf", "Acme")
+    make_font(tmp_path / "lib/b/Acme-Bold.ttf", "Acme", "Bold", 700)
+    scan(db, tmp_path / "lib")
+    db.query(Font).update({"fingerprint": None})
+    db.commit()
+    font = TTFont(ttf)
+    font.flavor = "woff"
+    (tmp_path / "lib/a").mkdir()
+    font.save(tmp_path / "lib/a/Acme-Regular.woff")
+    scan(db, tmp_path / "lib/a")
+
+    scan(db, tmp_path / "lib")
+
+    fonts = fonts_by_path(db)
+    woff = fonts[str(tmp_path / "lib/a/Acme-Regular.woff")]
+    assert fonts[str(ttf)].canonical_id == woff.id
+    assert fonts[str(ttf)].family_id == woff.family_id
+    family = db.get(Family, woff.family_id)
+    assert family.font_count == 2 and family.representative_id != fonts[str(ttf)].id
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+
+from backend.models.folder import Folder
+from backend.models.font import Font
+from backend.scripts import scan_jobs as scan_jobs_module
+from backend.scripts.scan_jobs import FINISHED, ScanJobs
+
+
+def finished(jobs, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job["status"] in FINISHED:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def add_folder(db, path):
+    folder = Folder(path=str(path))
+    db.add(folder)
+    db.commit()
+    return folder.id
+
+
+def test_widened_job_records_every_folder(db, make_font, tmp_path):
+    make_font(tmp_path / "lib/a/One.ttf", "One")
+    make_font(tmp_path / "lib/a/Two.ttf", "Two")
+    make_font(tmp_path / "lib/b/Three.ttf", "Three")
+    child_id, root_id = add_folder(db, tmp_path / "lib/a"), add_folder(db, tmp_path / "lib")
+
+    jobs = ScanJobs()
+    jobs._ensure_started = lambda: None  # les jobs restent en attente
+    child = jobs.submit(tmp_path / "lib/a", folder_id=child_id)
+    root = jobs.submit(tmp_path / "lib", folder_id=root_id)
+    assert root["id"] == child["id"] and root["path"] == str(tmp_path / "lib")
+    assert root["folder_ids"] == [child_id, root_id]
+
+    del jobs._ensure_started
+    jobs._ensure_started()
+    try:
+        assert finished(jobs, root["id"])["status"] == "done"
+    finally:
+        jobs.shutdown()
+
+    db.expire_all()
+    folders = {f.id: f for f in db.query(Folder)}
+    assert (folders[child_id].file_count, folders[child_id].font_count) == (2, 2)
+    assert (folders[root_id].file_count, folders[root_id].font_count) == (3, 3)
+    assert folders[child_id].status == folders[root_id].status == "idle"
+    assert folders[child_id].bytes_total == sum(p.stat().st_size for p in (tmp_path / "lib/a").iterdir())
+
+
+def test_parent_folds_every_pending_child(db, make_font, tmp_path, monkeypatch):
+    make_font(tmp_path / "lib/a/One.ttf", "One")
+    make_font(tmp_path / "lib/b/Two.ttf", "Two")
+    make_font(tmp_path / "lib/Three.ttf", "Three")
+    a_id, b_id, root_id = (add_folder(db, tmp_path / name) for name in ("lib/a", "lib/b", "lib"))
+    devices = {(tmp_path / "lib/a").resolve(): 1, (tmp_path / "lib/b").resolve(): 2, (tmp_path / "lib").resolve(): 3}
+    monkeypatch.setattr(scan_jobs_module, "device_of", devices.get)
+
+    jobs = ScanJobs()
+    jobs._ensure_started = lambda: None
+    a = jobs.submit(tmp_path / "lib/a", folder_id=a_id)
+    b = jobs.submit(tmp_path / "lib/b", folder_id=b_id)
+    root = jobs.submit(tmp_path / "lib", folder_id=root_id)
+
+    assert root["id"] == a["id"] and root["path"] == str((tmp_path / "lib").resolve())
+    assert root["folder_ids"] == [a_id, b_id, root_id] and root["device"] == 3
+    b = jobs.get(b["id"])
+    assert (b["status"], b["merged_into"]) == ("cancelled", root["id"])
+    assert jobs._queue == [root["id"]]
+
+    del jobs._ensure_started
+    jobs._ensure_started()
+    try:
+        assert finished(jobs, root["id"])["status"] == "done"
+    finally:
+        jobs.shutdown()
+
+    db.expire_all()
+    folders = {f.id: f for f in db.query(Folder)}
+    assert [folders[fid].font_count for fid in (a_id, b_id, root_id)] == [1, 1, 3]
+    assert {f.status for f in folders.values()} == {"idle"}
+
+
+def test_parent_waits_for_running_child_and_skips_it(db, make_font, tmp_path, monkeypatch):
+    make_font(tmp_path / "lib/a/One.ttf", "One")
+    make_font(tmp_path / "lib/b/Two.ttf", "Two")
+    calls, started, release = [], threading.Event(), threading.Event()
+    scan = scan_jobs_module.scan
+
+    def slow_scan(db, path, *args, exclude=(), **kwargs):
+        calls.append((path, list(exclude)))
+        if path == (tmp_path / "lib/a").resolve():
+            started.set()
+            release.wait(10)
+        return scan(db, path, *args, exclude=exclude, **kwargs)
+
+    monkeypatch.setattr(scan_jobs_module, "scan", slow_scan)
+    jobs = ScanJobs()
+    try:
+        child = jobs.submit(tmp_path / "lib/a")
+        assert started.wait(5)
+        parent = jobs.submit(tmp_path / "lib")
+        assert parent["id"] != child["id"] and parent["after"] == [child["id"]]
+        time.sleep(0.1)
+        assert jobs.get(parent["id"])["status"] == "pending"  # attend la fin du sous-dossier
+
+        release.set()
+        assert finished(jobs, child["id"])["status"] == "done"
+        parent = finished(jobs, parent["id"])
+    finally:
+        release.set()
+        jobs.shutdown()
+
+    assert parent["status"] == "done"
+    assert calls[1] == ((tmp_path / "lib").resolve(), [(tmp_path / "lib/a").resolve()])
+    assert (parent["counters"]["discovered"], parent["counters"]["missing"]) == (1, 0)
+    db.expire_all()
+    assert {f.status for f in db.query(Font)} == {"ok"} and db.query(Font).count() == 2
+
+
+def test_wait_async_wakes_on_change(tmp_path):
+    jobs = ScanJobs()
+    jobs._ensure_started = lambda: None
+    job = jobs.submit(tmp_path)
+
+    async def wait():
+        assert (await jobs.wait_async(job["id"], job["seq"], 0.05))["seq"] == job["seq"]  # délai écoulé
+        threading.Timer(0.05, jobs.cancel, [job["id"]]).start()
+        started = time.monotonic()
+        state = await jobs.wait_async(job["id"], job["seq"], 5)
+        return state, time.monotonic() - started
+
+    state, elapsed = asyncio.run(wait())
+    assert state["status"] == "cancelled" and elapsed < 2
+    assert not jobs._waiters
@@ -0,0 +1,91 @@
+import hashlib
+
+import pytest
+
+from backend.core.db import ingest_lock
+from backend.models.font import Family, Font
+from backend.scripts import sha_index
+from backend.scripts.sha_index import Sha1Index, shared_index
+
+
+def sha(n) -> str:
+    return hashlib.sha1(str(n).encode()).hexdigest()
+
+
+def add_fonts(db, shas):
+    family = Family(name="Test", name_normalized="test")
+    db.add(family)
+    db.flush()
+    for value in shas:
+        db.add(Font(path=f"/fonts/{value}.ttf", sha1=value, family_id=family.id))
+    db.commit()
+
+
+def test_lookup_present_and_absent(db):
+    # Digests finissant par des octets nuls : S20 les tronque à la lecture
+    shas = [sha(i) for i in range(500)] + ["ab" * 18 + "0000", "00" * 20]
+    add_fonts(db, shas)
+    index = Sha1Index(db)
+    assert all(index.has(value) for value in shas)
+    assert not any(index.has(sha(f"absent-{i}")) for i in range(2000))
+    assert index.known(shas[:3] + [sha("absent")]) == set(shas[:3])
+    index.close()
+
+
+def test_delta_is_saved_and_reopened(db):
+    add_fonts(db, [sha(i) for i in range(10)])
+    index = Sha1Index(db)
+    add_fonts(db, [sha("new")])
+    index.sync(db)
+    assert index.has(sha("new"))
+    index.save(db)
+    index.close()
+
+    reopened = Sha1Index(db)
+    assert reopened.has(sha("new"))
+    assert len(reopened._digests) == 11 and not reopened.added
+    reopened.close()
+
+
+def test_deleted_fonts_trigger_a_rebuild(db):
+    add_fonts(db, [sha(i) for i in range(10)])
+    Sha1Index(db).close()
+    db.query(Font).filter(Font.sha1 == sha(3)).delete()
+    db.commit()
+
+    index = Sha1Index(db)
+    assert not index.has(sha(3))
+    assert index.has(sha(4))
+    index.close()
+
+
+def test_shared_index_is_refreshed(db):
+    add_fonts(db, [sha(i) for i in range(5)])
+    with ingest_lock:
+        first = shared_index(db)
+        first.discard(sha(0))
+        first.add(sha(0))
+    assert first.has(sha(0))
+
+    db.query(Font).filter(Font.sha1 == sha(1)).delete()
+    db.commit()
+    add_fonts(db, [sha("late")])
+    with ingest_lock:
+        second = shared_index(db)
+        assert second is first
+        assert second.has(sha("late")) and not second.has(sha(1))
+        second.save(db)
+    assert sha_index.SHA1_INDEX_PATH.exists()
+
+
+def test_shared_index_requires_the_ingest_lock(db):
+    add_fonts(db, [sha(i) for i in range(3)])
+    with pytest.raises(RuntimeError):
+        shared_index(db)
+    with ingest_lock:
+        index = shared_index(db)
+    assert not hasattr(index, "db")  # aucune session gardée d'un appel à l'autre
+    with pytest.raises(RuntimeError):
+        index.add(sha("outside"))
+    with pytest.raises(RuntimeError):
+        index.save(db)
@@ -0,0 +1,47 @@
+from fontTools.ttLib import TTFont
+
+from backend.crud.family import refresh_family_stats
+from backend.models.font import Font
+from backend.scripts.scan import scan
+from backend.scripts.similar import similarity_index
+
+
+def test_duplicates_are_not_neighbours(db, make_font, tmp_path):
+    regular = make_font(tmp_path / "lib/Acme-Regular.ttf", "Acme")
+    make_font(tmp_path / "lib/Acme-Bold.ttf", "Acme", "Bold", 700, advance=600)
+    font = TTFont(regular)
+    font.flavor = "woff"
+    font.save(tmp_path / "lib/Acme-Regular.woff")
+    scan(db, tmp_path / "lib")
+
+    fonts = {f.path: f for f in db.query(Font)}
+    canonical = fonts[str(regular)]
+    duplicate = fonts[str(tmp_path / "lib/Acme-Regular.woff")]
+    assert duplicate.canonical_id == canonical.id
+
+    neighbours = similarity_index.similar(db, canonical.id, same_family=True)
+    assert [fid for fid, _ in neighbours] == [fonts[str(tmp_path / "lib/Acme-Bold.ttf")].id]
+    assert similarity_index.similar(db, duplicate.id) is None
+
+
+def test_invalidation_waits_for_commit(db, make_font, tmp_path):
+    make_font(tmp_path / "lib/Acme-Regular.ttf", "Acme")
+    make_font(tmp_path / "lib/Acme-Bold.ttf", "Acme", "Bold", 700, advance=600)
+    scan(db, tmp_path / "lib")
+    bold = db.query(Font).filter(Font.style_name == "Bold").one()
+    regular_id = db.query(Font.id).filter(Font.style_name == "Regular").scalar()
+    similarity_index.similar(db, regular_id, same_family=True)  # index chargé
+
+    bold.weight_class = 900
+    refresh_family_stats(db, [bold.family_id])
+    assert not similarity_index._dirty  # rien avant le commit
+    db.rollback()
+    db.commit()
+    assert not similarity_index._dirty  # le rollback a oublié les familles
+
+    bold = db.get(Font, bold.id)
+    bold.weight_class = 900
+    refresh_family_stats(db, [bold.family_id])
+    db.commit()
+    assert similarity_index._dirty == {bold.family_id}
+    assert similarity_index.similar(db, regular_id, same_family=True, weight_min=900)[0][0] == bold.id
@@ -0,0 +1,142 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.models.font import Family, Font
+from backend.scripts import subset_queue as subset_queue_module
+from backend.scripts.subset import subset_key, subset_path
+from backend.scripts.subset_queue import SubsetQueue
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """Queue without pool nor dispatcher: tests run and finish jobs by hand."""
+    queue = SubsetQueue(workers=1)
+    monkeypatch.setattr(queue, "_ensure_started", lambda: None)
+    monkeypatch.setattr(queue, "_record", lambda key, output: None)
+    return queue
+
+
+def finish(queue, key, output="/tmp/out.woff2", error=None):
+    job = queue.jobs[key]
+    job["status"] = "running"
+    queue._in_flight += 1
+    queue._finish(key, job["seq"], output and Path(output), error)
+
+
+def test_pending_and_running_jobs_are_coalesced(queue):
+    first = queue.enqueue(1, 10, Path("/fonts/a.ttf"), "k")
+    assert queue.enqueue(1, 10, Path("/fonts/a.ttf"), "k")["seq"] == first["seq"]
+
+    queue.jobs["k"]["status"] = "running"
+    assert queue.enqueue(1, 10, Path("/fonts/a.ttf"), "k")["seq"] == first["seq"]
+
+
+@pytest.mark.parametrize("output, error", [("/tmp/out.woff2", None), (None, "boom")])
+def test_finished_job_can_be_queued_again(queue, output, error):
+    # Manifeste ou fichier supprimé après coup : le subset doit pouvoir être régénéré
+    first = queue.enqueue(1, 10, Path("/fonts/a.ttf"), "k")
+    finish(queue, "k", output, error)
+    assert queue.jobs["k"]["status"] == ("done" if output else "error")
+
+    again = queue.enqueue(1, 10, Path("/fonts/a.ttf"), "k")
+    assert again["status"] == "pending"
+    assert again["seq"] != first["seq"]
+    assert queue.pending() == 1
+
+
+def test_only_recent_finished_jobs_are_kept(queue, monkeypatch):
+    monkeypatch.setattr(subset_queue_module, "FINISHED_JOBS", 2)
+    for key in ("a", "b", "c"):
+        queue.enqueue(1, 10, Path(f"/fonts/{key}.ttf"), key)
+    queue.enqueue(1, 11, Path("/fonts/d.ttf"), "d")
+    for key in ("a", "b", "c"):
+        finish(queue, key)
+
+    assert set(queue.jobs) == {"b", "c", "d"}
+    assert queue.jobs["d"]["status"] == "pending"
+
+    # Ré-enfilée puis terminée : elle redevient la plus récente
+    queue.enqueue(1, 10, Path("/fonts/b.ttf"), "b")
+    finish(queue, "b")
+    finish(queue, "d")
+    assert set(queue.jobs) == {"b", "d"}
+
+
+@pytest.fixture
+def preview_queue(monkeypatch):
+    """Real queue on a thread pool, with a fake encoder counting its calls."""
+    calls, gate, outputs = [], threading.Event(), []
+    gate.set()
+
+    def fake_subset(path, key):
+        calls.append(key)
+        gate.wait(5)
+        time.sleep(0.1)
+        output = subset_path(key)
+        output.write_bytes(b"wOF2" + key.encode())
+        outputs.append(output)
+        return output
+
+    monkeypatch.setattr(subset_queue_module, "subset", fake_subset)
+    monkeypatch.setattr(subset_queue_module, "ProcessPoolExecutor", ThreadPoolExecutor)
+    queue = SubsetQueue(workers=2)
+    monkeypatch.setattr(subset_queue_module, "subset_queue", queue)
+    yield queue, calls, gate
+    gate.set()
+    queue.join(5)
+    queue.shutdown()
+    for output in outputs:
+        output.unlink(missing_ok=True)
+
+
+def add_font(db):
+    family = Family(name="Preview", font_count=1)
+    db.add(family)
+    db.flush()
+    font = Font(path="/fonts/preview.ttf", sha1=uuid.uuid4().hex[:40].ljust(40, "0"), family_id=family.id)
+    db.add(font)
+    db.commit()
+    return font.id, subset_key(font.sha1)
+
+
+def test_concurrent_previews_share_one_queued_job(db, preview_queue):
+    queue, calls, _ = preview_queue
+    font_id, key = add_font(db)
+
+    with ThreadPoolExecutor(4) as pool:
+        responses = list(pool.map(lambda _: client.get(f"/fonts/{font_id}/preview"), range(4)))
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert {r.content for r in responses} == {b"wOF2" + key.encode()}
+    assert calls == [key]
+
+
+def test_preview_answers_202_until_the_subset_is_ready(db, preview_queue, monkeypatch):
+    queue, calls, gate = preview_queue
+    monkeypatch.setattr(subset_queue_module, "PREVIEW_WAIT", 0.05)
+    font_id, key = add_font(db)
+    gate.clear()
+
+    pending = client.get(f"/fonts/{font_id}/preview")
+    assert pending.status_code == 202
+    assert pending.headers["retry-after"] == "1"
+
+    gate.set()
+    assert queue.join(5)
+    assert client.get(f"/fonts/{font_id}/preview").status_code == 200
+    assert calls == [key]
+
+    # Fichier supprimé : la demande suivante le régénère
+    subset_path(key).unlink()
+    monkeypatch.setattr(subset_queue_module, "PREVIEW_WAIT", 5)
+    assert client.get(f"/fonts/{font_id}/preview").status_code == 200
+    assert calls == [key, key]
@@ -0,0 +1,46 @@
+import threading
+
+from backend.scripts import watcher as watcher_module
+from backend.scripts.watcher import FolderWatcher, _Poller
+
+
+def test_first_snapshot_does_not_block_watch(monkeypatch, tmp_path):
+    monkeypatch.setattr(watcher_module, "Observer", None)
+    release, started = threading.Event(), threading.Event()
+    take = _Poller._take
+
+    def slow_take(self):
+        started.set()
+        release.wait(5)
+        return take(self)
+
+    monkeypatch.setattr(_Poller, "_take", slow_take)
+    watcher = FolderWatcher()
+    try:
+        watcher.watch(tmp_path)  # rend la main pendant le parcours initial
+        assert started.wait(5)
+        assert watcher.watched() == [str(tmp_path.resolve())]
+        with watcher._cond:  # la condition reste libre pour les autres appels
+            pass
+    finally:
+        release.set()
+        watcher.shutdown()
+
+
+def test_unwatch_during_creation_stops_the_poller(monkeypatch, tmp_path):
+    monkeypatch.setattr(watcher_module, "Observer", None)
+    watcher = FolderWatcher()
+    created = []
+
+    class Poller(_Poller):
+        def __init__(self, owner, root):
+            owner.unwatch(root)  # unwatch() passe entre la réservation et l'enregistrement
+            super().__init__(owner, root)
+            created.append(self)
+
+    monkeypatch.setattr(watcher_module, "_Poller", Poller)
+    watcher.watch(tmp_path)
+
+    assert watcher.watched() == []
+    assert created[0]._stop.is_set()
+    watcher.shutdown()